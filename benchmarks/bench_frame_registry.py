@@ -0,0 +1,101 @@
+"""
+Benchmark of CSMA collision detection: the original scan over the frames_in_transmit dict vs
+FrameRegistry, on the same stream of frame start/end events with many concurrent stations.
+Also checks that both give the same retry flags.
+
+    python benchmarks/bench_frame_registry.py --stations 100 1000 5000
+"""
+import argparse
+import heapq
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from simulation.CSMA.frame_registry import FrameRegistry
+
+
+class Frame:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.retry = False
+
+
+class DictRegistry:
+    """The original registry: a dict scanned on every check."""
+    def __init__(self):
+        self.frames = {}
+
+    def add(self, frame_id, frame):
+        self.frames[frame_id] = frame
+
+    def remove(self, frame_id):
+        return self.frames.pop(frame_id, None)
+
+    def check_collision(self, frame, frame_id):
+        has_collision = False
+        for key, other_frame in self.frames.items():
+            if key != frame_id and (other_frame.end > frame.start) and (other_frame.start < frame.end):
+                has_collision = True
+                other_frame.retry = True
+        if has_collision:
+            frame.retry = True
+
+
+def make_workload(num_stations, frames_per_station, seed):
+    """Integer start/end times, so many events coincide as they do in csma.py."""
+    rng = np.random.default_rng(seed)
+    gaps = rng.poisson(10, (num_stations, frames_per_station))
+    lengths = rng.geometric(1 - np.exp(-0.25), (num_stations, frames_per_station))
+    ends = np.cumsum(gaps + lengths, axis=1)
+    starts = ends - lengths
+    return starts.tolist(), ends.tolist()
+
+
+def run(registry, starts, ends):
+    """Replay the workload in time order (ends before starts at equal times, like a frame retried at once)."""
+    events = []
+    for station, (s, e) in enumerate(zip(starts, ends)):
+        for i in range(len(s)):
+            events.append((s[i], 1, station, i))
+            events.append((e[i], 0, station, i))
+    heapq.heapify(events)
+    frames = {}
+    retries = []
+    t0 = time.perf_counter()
+    while events:
+        _, kind, station, i = heapq.heappop(events)
+        frame_id = (station, i)
+        if kind == 1:
+            frames[frame_id] = Frame(starts[station][i], ends[station][i])
+            registry.add(frame_id, frames[frame_id])
+        else:
+            frame = frames.pop(frame_id)
+            registry.check_collision(frame, frame_id)
+            registry.remove(frame_id)
+            retries.append(frame.retry)
+    return time.perf_counter() - t0, retries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stations', type=int, nargs='+', default=[100, 1000, 2000, 5000])
+    parser.add_argument('--frames', type=int, default=20, help='frames per station')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'stations':>8} {'checks':>8} {'in flight':>9} {'dict (s)':>9} {'registry (s)':>12} {'speedup':>8}")
+    for num_stations in args.stations:
+        starts, ends = make_workload(num_stations, args.frames, args.seed)
+        mean_in_flight = sum(e - s for row_s, row_e in zip(starts, ends) for s, e in zip(row_s, row_e)) / max(max(row) for row in ends)
+        t_dict, retries_dict = run(DictRegistry(), starts, ends)
+        t_registry, retries_registry = run(FrameRegistry(), starts, ends)
+        assert retries_dict == retries_registry, "retry flags differ"
+        print(f"{num_stations:>8} {len(retries_dict):>8} {mean_in_flight:>9.1f} {t_dict:>9.3f} {t_registry:>12.3f} {t_dict / t_registry:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
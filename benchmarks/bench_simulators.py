@@ -0,0 +1,166 @@
+"""
+Throughput and scaling benchmark of the simulators: slotted ALOHA without (simpy, numpy and
+aggregate-count backends) and with retransmissions (simpy and numpy), CSMA and test2.py. Every
+(simulator, node count, horizon) case runs in a fresh subprocess and records the wall time, simulated
+slots per second, SimPy events per second and the peak RSS of that process.
+
+    python benchmarks/bench_simulators.py --nodes 10 100 1000 10000 --horizon 1000 10000 --out bench.json
+    python benchmarks/bench_simulators.py --baseline bench.json   # exit code 1 on a regression
+
+Event-driven cases whose nodes x horizon exceeds --max-node-slots are skipped (recorded as such).
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# name -> (script, backend, event driven, run(module, nodes, horizon, seed))
+SIMULATORS = {
+    'aloha-simpy': ('simulation/ALOHA/slotted_aloha_no-re-xmit.py', True,
+                    lambda m, n, T, seed: m.run_simulation(n, 0.1 / n, T, 'simpy', seed, None, verbose=False)),
+    'aloha-numpy': ('simulation/ALOHA/slotted_aloha_no-re-xmit.py', False,
+                    lambda m, n, T, seed: m.run_simulation(n, 0.1 / n, T, 'numpy', seed, None, verbose=False)),
+    'aloha-aggregate': ('simulation/ALOHA/slotted_aloha_no-re-xmit.py', False,
+                        lambda m, n, T, seed: m.run_simulation(n, 0.1 / n, T, 'aggregate', seed, None, verbose=False)),
+    'aloha-rexmit-simpy': ('simulation/ALOHA/slotted_aloha_re-xmit.py', True,
+                           lambda m, n, T, seed: m.run_simulation(n, 0.3 / n, T, seed, False, 'simpy')),
+    'aloha-rexmit-numpy': ('simulation/ALOHA/slotted_aloha_re-xmit.py', False,
+                           lambda m, n, T, seed: m.run_simulation(n, 0.3 / n, T, seed, False, 'numpy')),
+    'csma': ('simulation/CSMA/csma.py', True,
+             lambda m, n, T, seed: m.run_replication(seed, n, terminate_time=T)),
+    'test2': ('test2.py', True,
+              lambda m, n, T, seed: m.run_simulation(n, 0.1 / n, T, seed, verbose=False)),
+}
+
+
+def count_environments():
+    """Keep every simpy.Environment created from now on, to read its event counter afterwards."""
+    import simpy
+
+    environments = []
+    init = simpy.Environment.__init__
+
+    def tracked_init(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        environments.append(self)
+
+    simpy.Environment.__init__ = tracked_init
+    return environments
+
+
+def measure(name, nodes, horizon, seed):
+    """Run one case in this process and return its measurements."""
+    from loader import load_script
+
+    script, event_driven, run = SIMULATORS[name]
+    module = load_script(script)
+    environments = count_environments() if event_driven else []
+    # The output analysis imports scipy.stats lazily; its first import is not the simulator's time
+    import scipy.stats  # noqa: F401
+
+    t0 = time.perf_counter()
+    run(module, nodes, horizon, seed)
+    wall = time.perf_counter() - t0
+
+    # Every scheduled SimPy event takes the next id of the environment's counter
+    events = sum(next(env._eid) for env in environments) if event_driven else None
+    return {
+        'simulator': name, 'nodes': nodes, 'horizon': horizon, 'wall': wall,
+        'slots_per_s': horizon / wall,
+        'node_slots_per_s': nodes * horizon / wall,
+        'events': events,
+        'events_per_s': events / wall if events is not None else None,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_case(name, nodes, horizon, seed, repeat):
+    """Best of `repeat` runs, each in a fresh interpreter so the peak RSS belongs to this case alone."""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', name, str(nodes), str(horizon), str(seed)],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        if best is None or result['wall'] < best['wall']:
+            best = result
+    return best
+
+
+def compare(results, baseline, tolerance):
+    """Wall time ratio to the baseline for every case present in both; returns the regressed cases."""
+    reference = {(r['simulator'], r['nodes'], r['horizon']): r for r in baseline['results'] if not r.get('skipped')}
+    regressions = []
+    for r in results:
+        base = reference.get((r['simulator'], r['nodes'], r['horizon']))
+        if base is None or r.get('skipped'):
+            continue
+        r['baseline_wall'] = base['wall']
+        r['ratio'] = r['wall'] / base['wall']
+        if r['ratio'] > 1 + tolerance:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--simulators', nargs='+', choices=sorted(SIMULATORS), default=list(SIMULATORS))
+    parser.add_argument('--nodes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--horizon', type=int, nargs='+', default=[1000, 10000], help='simulated slots / time units')
+    parser.add_argument('--max-node-slots', type=float, default=2e7,
+                        help='skip event-driven cases with nodes x horizon above this')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case, the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='write the results as JSON')
+    parser.add_argument('--baseline', default=None, help='JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs the baseline (0.2 = 20%%)')
+    parser.add_argument('--worker', nargs=4, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        name, nodes, horizon, seed = args.worker
+        print(json.dumps(measure(name, int(nodes), int(horizon), int(seed))))
+        return
+
+    results = []
+    print(f"{'simulator':>20} {'nodes':>6} {'horizon':>7} {'wall (s)':>9} {'slots/s':>10} {'events/s':>10} {'RSS (MB)':>8}")
+    for name in args.simulators:
+        for nodes in args.nodes:
+            for horizon in args.horizon:
+                if SIMULATORS[name][1] and nodes * horizon > args.max_node_slots:
+                    results.append({'simulator': name, 'nodes': nodes, 'horizon': horizon, 'skipped': True})
+                    continue
+                r = run_case(name, nodes, horizon, args.seed, args.repeat)
+                results.append(r)
+                events = f"{r['events_per_s']:>10.0f}" if r['events_per_s'] is not None else f"{'-':>10}"
+                print(f"{name:>20} {nodes:>6} {horizon:>7} {r['wall']:>9.3f} {r['slots_per_s']:>10.0f} {events} "
+                      f"{r['peak_rss_kb'] / 1024:>8.1f}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['simulator']} nodes={r['nodes']} horizon={r['horizon']}: "
+                  f"{r['wall']:.3f}s vs {r['baseline_wall']:.3f}s ({r['ratio']:.2f}x)")
+
+    if args.out:
+        report = {
+            'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results,
+        }
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
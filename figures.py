@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Batch rendering never needs a GUI; set before any worker imports matplotlib
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from loader import load_script
+from plotting import save_figure
+
+# Default report: name -> (script, data function or Class.method, constructor kwargs, call kwargs)
+FIGURES = {
+    'tdma_delay_vs_M': ('theory/TDMA/simplified_tdma.py', 'Simplified_TDMA.delay_vs_M_data', {}, {}),
+    'tdma_delay_vs_P': ('theory/TDMA/simplified_tdma.py', 'Simplified_TDMA.delay_vs_P_data', {}, {}),
+    'fdma_delay_vs_M': ('theory/FDMA/simplified_fdma.py', 'Simplified_FDMA.delay_vs_M_data', {}, {}),
+    'fdma_delay_vs_P': ('theory/FDMA/simplified_fdma.py', 'Simplified_FDMA.delay_vs_P_data', {}, {}),
+    'generalized_fdma_delay_vs_M': ('theory/FDMA/generalized_fdma.py', 'Generalized_FDMA.delay_vs_M_data', {}, {}),
+    'generalized_fdma_delay_vs_P': ('theory/FDMA/generalized_fdma.py', 'Generalized_FDMA.delay_vs_P_data', {}, {}),
+    'generalized_tdma_delay_vs_M': ('theory/TDMA/generalized_tdma.py', 'Generalized_TDMA.delay_vs_M_data', {}, {}),
+    'generalized_tdma_delay_vs_P': ('theory/TDMA/generalized_tdma.py', 'Generalized_TDMA.delay_vs_P_data', {}, {}),
+    'tdma_vs_fdma': ('theory/tdma_vs_fdma.py', 'tdma_vs_fdma_data', {}, {}),
+    'tdma_delay_vs_P_simulated': (
+        'simulation/tdma_fdma.py', 'validated_delay_vs_P_data', {}, {'scheme': 'tdma', 'messages': 2 * 10 ** 5}),
+    'fdma_delay_vs_P_simulated': (
+        'simulation/tdma_fdma.py', 'validated_delay_vs_P_data', {}, {'scheme': 'fdma', 'messages': 2 * 10 ** 5}),
+    'diversity_throughput_replacement': (
+        'theory/diversity_SA/diversity_sa.py', 'FrequentDiversity.throughput_vs_activity_factor_replacement_data',
+        {'l': 8, 'k': 1, 'G': 0.8}, {}),
+    'diversity_throughput_without_replacement': (
+        'theory/diversity_SA/diversity_sa.py', 'FrequentDiversity.throughput_vs_activity_factor_without_replacement_data',
+        {'l': 8, 'k': 1, 'G': 0.8}, {}),
+    'diversity_throughput_without_replacement_short': (
+        'theory/diversity_SA/diversity_sa.py', 'FrequentDiversity.throughput_vs_activity_factor_without_replacement_short_data',
+        {'l': 8, 'k': 1, 'G': 0.8}, {}),
+    'diversity_beta_vs_Smax_replacement': (
+        'theory/diversity_SA/diversity_sa.py', 'FrequentDiversity.beta_vs_Smax_replacement_data',
+        {'l': 8, 'k': 1, 'G': 0.8}, {}),
+    'diversity_beta_vs_Smax_without_replacement': (
+        'theory/diversity_SA/diversity_sa.py', 'FrequentDiversity.beta_vs_Smax_without_replacement_data',
+        {'l': 8, 'k': 1, 'G': 0.8}, {}),
+    'time_diversity_throughput_replacement': (
+        'theory/diversity_SA/diversity_sa.py', 'TimeDiversity.throughput_vs_activity_factor_replacement_data',
+        {'l': 8, 'k': 1, 'G': 0.8}, {}),
+    'aloha_aoi_vs_time': (
+        'simulation/ALOHA/slotted_aloha_no-re-xmit.py', 'simulated_aoi_data',
+        {}, {'N': 10, 'P': 0.01, 'MaxSimtime': 100000.0, 'seed': 1, 'trace_every': None, 'trace_window': 100}),
+}
+
+
+def load_config(path):
+    """
+    Read a report config: a JSON object mapping figure names to
+    {"script": ..., "target": ..., "init": {...}, "kwargs": {...}} (init/kwargs optional),
+    or to the name of a figure of the default report.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    figures = {}
+    for name, entry in config.items():
+        if isinstance(entry, str):
+            figures[name] = FIGURES[entry]
+        else:
+            figures[name] = (entry['script'], entry['target'], entry.get('init', {}), entry.get('kwargs', {}))
+    return figures
+
+
+def figure_spec(script, target, init, kwargs):
+    """Compute the figure spec of one registry entry."""
+    module = load_script(script)
+    if '.' in target:
+        cls, method = target.split('.')
+        return getattr(getattr(module, cls)(**init), method)(**kwargs)
+    return getattr(module, target)(**kwargs)
+
+
+def render_task(task):
+    name, entry, out_dir, formats = task
+    spec = figure_spec(*entry)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f'{name}.{fmt}')
+        save_figure(spec, path)
+        paths.append(path)
+    return paths
+
+
+def render(figures=None, out_dir='figures', formats=('png',), processes=None):
+    """
+    Compute and save every figure of the registry (default: FIGURES) in each format
+    (png, svg, pdf, ...). Figures are independent and rendered on a process pool.
+    Returns the written paths.
+    """
+    figures = FIGURES if figures is None else figures
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(name, entry, out_dir, tuple(formats)) for name, entry in figures.items()]
+
+    if processes == 1:
+        results = [render_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(render_task, tasks))
+    return [path for paths in results for path in paths]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the toolbox figures to files without a display.')
+    parser.add_argument('--config', default=None, help='JSON report config (default: all registered figures)')
+    parser.add_argument('--only', nargs='+', default=None, help='render only these figures')
+    parser.add_argument('--out', default='figures', help='output directory')
+    parser.add_argument('--formats', nargs='+', default=['png'], help='file formats, e.g. png svg pdf')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--list', action='store_true', help='list the registered figures and exit')
+    args = parser.parse_args(argv)
+
+    figures = load_config(args.config) if args.config else FIGURES
+    if args.list:
+        print('\n'.join(figures))
+        return
+    if args.only:
+        figures = {name: figures[name] for name in args.only}
+
+    paths = render(figures, args.out, args.formats, args.processes)
+    print(f"Wrote {len(paths)} files to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import importlib.util
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(path):
+    """
+    Import one of the toolbox scripts by its path relative to the repository root.
+    Scripts whose path is a dotted module name (e.g. simulation/CSMA/csma.py) are imported as
+    that module, so their functions pickle by a name that spawned worker processes can import.
+    Several scripts (e.g. slotted_aloha_no-re-xmit.py) are not valid module names, so they
+    are loaded from the file and registered under a sanitized name.
+    """
+    path = os.path.join(ROOT, path)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    parts = os.path.splitext(os.path.relpath(path, ROOT))[0].split(os.sep)
+    if all(part.isidentifier() for part in parts):
+        return importlib.import_module('.'.join(parts))
+
+    name = 'mac_' + re.sub(r'\W', '_', '_'.join(parts))
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
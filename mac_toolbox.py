@@ -0,0 +1,282 @@
+"""
+mac-toolbox: command line front end for the models of the toolbox.
+
+    python mac_toolbox.py slotted-aloha --N 20 --P 0.05 --backend numpy
+    python mac_toolbox.py tdma --M 10 100 --P 0.5 0.9
+
+Each subcommand loads only its own model, so the analytic queries (tdma, fdma, diversity) cost
+little more than importing NumPy; SimPy, SciPy, PrettyTable and matplotlib are imported only by
+the runs and plots that use them.
+"""
+import argparse
+import json
+
+from loader import load_script
+
+
+def print_json(results):
+    print(json.dumps(results, indent=2, default=float))
+
+
+def print_table(columns, rows):
+    print(' '.join(f'{name:>12}' for name in columns))
+    for row in rows:
+        print(' '.join(f'{value:>12.6g}' for value in row))
+
+
+def instrumentation(args):
+    """An Instrumentation for --instrument / --profile, else None."""
+    if not (args.instrument or args.profile):
+        return None
+    from simulation.instrumentation import Instrumentation
+
+    return Instrumentation(profile=args.profile)
+
+
+def checkpointing(args):
+    """Checkpoint and stopping keyword arguments of the vectorized engines."""
+    options = {'checkpoint': args.checkpoint, 'rel_precision': args.rel_precision}
+    if args.checkpoint_every is not None:
+        options['checkpoint_every'] = args.checkpoint_every
+    return options
+
+
+def transient(value):
+    """--transient: 'mser' or a fixed warm-up time."""
+    return value if value == 'mser' else float(value)
+
+
+def report_instrumentation(inst):
+    if inst is not None:
+        print("-----------------------")
+        inst.report()
+
+
+def print_comparison(args, comparison):
+    if args.json:
+        print_json(comparison)
+        return
+    from simulation.crn import print_comparison
+
+    print_comparison(comparison)
+
+
+def slotted_aloha(args):
+    module = load_script('simulation/ALOHA/slotted_aloha_no-re-xmit.py')
+    if args.compare_P is not None:
+        print_comparison(args, module.compare({'P': args.P}, {'P': args.compare_P}, args.replications, args.seed,
+                                              N=args.N, MaxSimtime=args.time))
+        return
+    trace_every = 1 if args.plot and args.trace_window is None else None
+    inst = instrumentation(args)
+    results = module.run_simulation(args.N, args.P, args.time, args.backend, args.seed, trace_every,
+                                    args.trace_window if args.plot else None, verbose=not args.json,
+                                    instrumentation=inst, crn=args.crn, **checkpointing(args))
+    if args.json:
+        print_json(results)
+    report_instrumentation(inst)
+
+
+def aloha_rexmit(args):
+    module = load_script('simulation/ALOHA/slotted_aloha_re-xmit.py')
+    if args.compare_backoff is not None or args.compare_lam is not None:
+        params_a = {'lam': args.lam, 'backoff_max': args.backoff_max}
+        params_b = {'lam': args.compare_lam if args.compare_lam is not None else args.lam,
+                    'backoff_max': args.compare_backoff if args.compare_backoff is not None else args.backoff_max}
+        print_comparison(args, module.compare(params_a, params_b, args.replications, args.seed,
+                                              num_nodes=args.nodes, sim_time=args.time))
+        return
+    inst = instrumentation(args)
+    results = module.run_simulation(args.nodes, args.lam, args.time, args.seed, not args.json, args.backend,
+                                    instrumentation=inst, backoff_max=args.backoff_max, crn=args.crn,
+                                    **checkpointing(args))
+    if args.json:
+        print_json(results)
+    report_instrumentation(inst)
+
+
+def csma(args):
+    module = load_script('simulation/CSMA/csma.py')
+    inst = instrumentation(args)
+    if inst is not None:
+        # Instrument a single replication in this process
+        results = module.run_replication(args.seed, args.stations, args.exponential_mean, args.poisson_mean,
+                                         args.time, inst, args.transient, args.rel_precision, args.check_every)
+        print_json(results)
+        report_instrumentation(inst)
+        return
+    results = module.run_replications(args.replications, args.seed, args.processes, args.confidence, args.checkpoint,
+                                      num_stations=args.stations, exponential_mean=args.exponential_mean,
+                                      poisson_mean=args.poisson_mean, terminate_time=args.time,
+                                      transient_time=args.transient, rel_precision=args.rel_precision,
+                                      check_every=args.check_every)
+    if args.json:
+        print_json(results)
+        return
+    replications = results['replications']
+    module.generate_report_all_replications([r['mean_transmit_time'] for r in replications],
+                                            [r['mean_retries'] for r in replications],
+                                            [r['channel_utilization'] for r in replications], args.confidence)
+
+
+def delay_model(args, models):
+    import numpy as np
+    from theory.analytic import delay_surface
+
+    script, cls = models[args.model]
+    model = getattr(load_script(script), cls)()
+    delays = delay_surface(model, args.M, args.P, args.L if args.model == 'generalized' else None)
+    columns = ['M', 'P', 'delay']
+    grid = [a.ravel() for a in np.broadcast_arrays(np.asarray(args.M)[:, None], np.asarray(args.P)[None, :], delays)]
+    if args.simulate:
+        from simulation.tdma_fdma import simulate_delay
+
+        L = args.L if args.model == 'generalized' else 1
+        simulated = [simulate_delay(args.command, m, p, L, args.simulate, seed=args.seed) for m, p in zip(grid[0], grid[1])]
+        columns += ['simulated', '+/-']
+        grid += [[m for m, _ in simulated], [h for _, h in simulated]]
+    print_table(columns, zip(*grid))
+    if args.plot:
+        model.plot_delay_vs_P()
+
+
+def tdma(args):
+    delay_model(args, {'simplified': ('theory/TDMA/simplified_tdma.py', 'Simplified_TDMA'),
+                       'generalized': ('theory/TDMA/generalized_tdma.py', 'Generalized_TDMA')})
+
+
+def fdma(args):
+    delay_model(args, {'simplified': ('theory/FDMA/simplified_fdma.py', 'Simplified_FDMA'),
+                       'generalized': ('theory/FDMA/generalized_fdma.py', 'Generalized_FDMA')})
+
+
+def diversity(args):
+    import numpy as np
+
+    module = load_script('theory/diversity_SA/diversity_sa.py')
+    agent = (module.FrequentDiversity if args.model == 'frequency' else module.TimeDiversity)(args.l, args.k, args.G[0])
+    G = np.asarray(args.G, dtype=float)
+    if args.without_replacement:
+        Ps = agent.calculate_Ps_without_replacement(args.k, G)
+    else:
+        Ps = agent.calculate_Ps_grid_replacement(args.l, args.k, G)
+    print_table(['G', 'Ps', 'S'] + [f'beta{n}' for n in args.n],
+                zip(G, Ps, G * Ps, *[(1 - Ps) ** n for n in args.n]))
+
+    if args.smax and not args.without_replacement:
+        smax = load_script('theory/diversity_SA/smax.py')
+        G_star, S_max = smax.solve_Smax([(args.l, args.k)])
+        print(f"G*={G_star[0]:.6f}  S_max={S_max[0]:.6f}")
+    if args.plot:
+        if args.model == 'time':
+            agent.plot_throughput_vs_activity_factor_replacement(l=args.l, G=max(args.G))
+        elif args.without_replacement:
+            agent.plot_beta_vs_Smax_without_replacement()
+        else:
+            agent.plot_beta_vs_Smax_replacement(l=args.l)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='mac-toolbox', description='MAC protocol simulators and analytic models.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('slotted-aloha', help='slotted ALOHA without retransmission (AoL)')
+    p.add_argument('--N', type=int, default=20, help='number of nodes')
+    p.add_argument('--P', type=float, default=0.2, help='transmission probability per slot')
+    p.add_argument('--time', type=float, default=10000.0, help='simulated time (slots)')
+    p.add_argument('--backend', choices=['simpy', 'numpy', 'aggregate'], default='simpy',
+                   help='aggregate: draw only the number of transmitters per slot (cost independent of N)')
+    p.add_argument('--seed', type=int, default=None)
+    p.add_argument('--plot', action='store_true', help='plot the AoL trace')
+    p.add_argument('--trace-window', type=int, default=None, help='plot the min/max AoL over windows of this many slots')
+    p.add_argument('--json', action='store_true', help='print the results as JSON')
+    p.add_argument('--instrument', action='store_true', help='report events and hot-path timings of the simpy run')
+    p.add_argument('--profile', default=None, help='also write a cProfile of the simpy run to this file')
+    p.add_argument('--checkpoint', default=None, help='numpy backend: save/resume the run state in this file')
+    p.add_argument('--checkpoint-every', type=int, default=None, help='slots between checkpoints')
+    p.add_argument('--rel-precision', type=float, default=None,
+                   help='numpy backend: stop once the CIs are within this fraction of the means')
+    p.add_argument('--crn', action='store_true', help='numpy backend: common random numbers keyed by node and slot')
+    p.add_argument('--compare-P', type=float, default=None,
+                   help='compare against this P with paired CRN replications instead of a single run')
+    p.add_argument('--replications', type=int, default=10, help='replications of a comparison')
+    p.set_defaults(func=slotted_aloha)
+
+    p = commands.add_parser('aloha-rexmit', help='slotted ALOHA with retransmissions')
+    p.add_argument('--nodes', type=int, default=10)
+    p.add_argument('--lam', type=float, default=0.1, help='arrival rate per node')
+    p.add_argument('--time', type=float, default=1000, help='simulated time')
+    p.add_argument('--backend', choices=['simpy', 'numpy'], default='simpy')
+    p.add_argument('--seed', type=int, default=None)
+    p.add_argument('--json', action='store_true', help='print the results as JSON')
+    p.add_argument('--instrument', action='store_true', help='report events and hot-path timings of the simpy run')
+    p.add_argument('--profile', default=None, help='also write a cProfile of the simpy run to this file')
+    p.add_argument('--checkpoint', default=None, help='numpy backend: save/resume the run state in this file')
+    p.add_argument('--checkpoint-every', type=int, default=None, help='slots between checkpoints')
+    p.add_argument('--rel-precision', type=float, default=None,
+                   help='numpy backend: stop once the CIs are within this fraction of the means')
+    p.add_argument('--backoff-max', type=int, default=10, help='retries wait randint(1, BACKOFF_MAX) slots')
+    p.add_argument('--crn', action='store_true',
+                   help='numpy backend: common random numbers keyed by node and event number')
+    p.add_argument('--compare-backoff', type=int, default=None,
+                   help='compare against this backoff_max with paired CRN replications instead of a single run')
+    p.add_argument('--compare-lam', type=float, default=None,
+                   help='compare against this arrival rate with paired CRN replications instead of a single run')
+    p.add_argument('--replications', type=int, default=10, help='replications of a comparison')
+    p.set_defaults(func=aloha_rexmit)
+
+    p = commands.add_parser('csma', help='CSMA replications with confidence intervals')
+    p.add_argument('--stations', type=int, default=4)
+    p.add_argument('--replications', type=int, default=8)
+    p.add_argument('--time', type=float, default=10000, help='simulated time per replication')
+    p.add_argument('--exponential-mean', type=float, default=0.25)
+    p.add_argument('--poisson-mean', type=float, default=10)
+    p.add_argument('--confidence', type=float, default=0.95)
+    p.add_argument('--seed', type=int, default=None)
+    p.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    p.add_argument('--json', action='store_true', help='print the results as JSON')
+    p.add_argument('--instrument', action='store_true', help='report events and hot-path timings of the simpy run')
+    p.add_argument('--profile', default=None, help='also write a cProfile of the simpy run to this file')
+    p.add_argument('--checkpoint', default=None, help='save finished replications to this file and resume from it')
+    p.add_argument('--transient', type=transient, default='mser', help="warm-up: 'mser' (detected) or a fixed time")
+    p.add_argument('--rel-precision', type=float, default=None,
+                   help='stop a replication once the transmit-time CI is within this fraction of the mean')
+    p.add_argument('--check-every', type=float, default=1000, help='time between precision checks')
+    p.set_defaults(func=csma)
+
+    for name, func, models in (('tdma', tdma, ['simplified', 'generalized']), ('fdma', fdma, ['simplified', 'generalized'])):
+        p = commands.add_parser(name, help=f'{name.upper()} expected delay')
+        p.add_argument('--model', choices=models, default='simplified')
+        p.add_argument('--M', type=float, nargs='+', default=[10], help='number of servers')
+        p.add_argument('--P', type=float, nargs='+', default=[0.5], help='utilization')
+        p.add_argument('--L', type=float, default=1, help='packets per message (generalized model)')
+        p.add_argument('--simulate', type=int, default=None, metavar='MESSAGES',
+                       help='also simulate the queues with this many messages per point')
+        p.add_argument('--seed', type=int, default=None)
+        p.add_argument('--plot', action='store_true', help='plot the delay vs utilization')
+        p.set_defaults(func=func)
+
+    p = commands.add_parser('diversity', help='diversity slotted ALOHA success probability and throughput')
+    p.add_argument('--model', choices=['frequency', 'time'], default='frequency')
+    p.add_argument('--l', type=int, default=8, help='number of channels (slots for time diversity)')
+    p.add_argument('--k', type=int, default=1, help='copies sent per user')
+    p.add_argument('--G', type=float, nargs='+', default=[0.8], help='offered load')
+    p.add_argument('--n', type=int, nargs='+', default=[1, 2], help='failures counted by beta = (1 - Ps)^n')
+    p.add_argument('--without-replacement', action='store_true')
+    p.add_argument('--smax', action='store_true', help='also solve for the maximum throughput and its load')
+    p.add_argument('--plot', action='store_true',
+                   help='plot beta vs Smax (frequency) or throughput vs activity factor up to the largest G (time)')
+    p.set_defaults(func=diversity)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'diversity' and args.plot and args.model == 'time' and args.without_replacement:
+        parser.error('diversity --plot: the time diversity model only plots with replacement')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
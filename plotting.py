@@ -0,0 +1,55 @@
+"""
+Drawing of figure specs. The plot_* methods of the models only compute a spec, a plain dict
+    {'title', 'xlabel', 'ylabel', 'xscale', 'yscale', 'xlim', 'ylim', 'legend',
+     'series': [{'x', 'y', 'label', 'linestyle', 'y2', 'yerr', 'marker', 'z'}, ...]}
+where a series with 'y2' is drawn as a band between y2 and y, one with 'yerr' as points
+(default marker 'o') with error bars, e.g. simulated estimates over an analytic curve, and one
+with 'z' as a colour map of z[len(y), len(x)] with the label on its colour bar, rasterized so
+that vector formats stay small on large grids. Specs are drawn interactively with show_figure
+or written to files with save_figure, which needs no GUI backend.
+"""
+
+
+def draw(spec, ax):
+    for series in spec['series']:
+        if 'z' in series:
+            mesh = ax.pcolormesh(series['x'], series['y'], series['z'], shading='auto', rasterized=True)
+            ax.figure.colorbar(mesh, ax=ax, label=series.get('label'))
+        elif 'y2' in series:
+            ax.fill_between(series['x'], series['y2'], series['y'], step='post', alpha=0.5, label=series.get('label'))
+        elif 'yerr' in series:
+            ax.errorbar(series['x'], series['y'], yerr=series['yerr'], fmt=series.get('marker', 'o'), capsize=3,
+                        label=series.get('label'))
+        else:
+            ax.plot(series['x'], series['y'], ls=series.get('linestyle', '-'), label=series.get('label'))
+    ax.set_xlabel(spec.get('xlabel', ''))
+    ax.set_ylabel(spec.get('ylabel', ''))
+    ax.set_title(spec.get('title', ''))
+    if spec.get('xscale'):
+        ax.set_xscale(spec['xscale'])
+    if spec.get('yscale'):
+        ax.set_yscale(spec['yscale'])
+    if spec.get('xlim'):
+        ax.set_xlim(*spec['xlim'])
+    if spec.get('ylim'):
+        ax.set_ylim(*spec['ylim'])
+    if spec.get('legend', True) and any(series.get('label') and 'z' not in series for series in spec['series']):
+        ax.legend()
+    ax.grid()
+
+
+def show_figure(spec):
+    """Draw a spec with pyplot and show it."""
+    import matplotlib.pyplot as plt
+
+    draw(spec, plt.gca())
+    plt.show()
+
+
+def save_figure(spec, path):
+    """Draw a spec on a standalone Figure (no pyplot, no GUI) and save it; the format follows the extension."""
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    draw(spec, figure.add_subplot())
+    figure.savefig(path)
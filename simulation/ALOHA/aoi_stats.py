@@ -0,0 +1,179 @@
+import copy
+
+import numpy as np
+
+
+class AoIStatistics:
+    """
+    Streaming Age-of-Information statistics in O(1) memory.
+    Keeps the mean, variance (Welford/Chan updates), maximum, mean peak AoI (the age right
+    before each drop), a fixed-bin histogram and histogram-based quantiles. Optionally keeps
+    a decimated trace for plotting: every k-th sample (trace_every=k) or the min/max of each
+    window of w samples (trace_window=w).
+    """
+    def __init__(self, max_age=1000, bin_width=1, trace_every=None, trace_window=None):
+        if trace_every is not None and trace_window is not None:
+            raise ValueError("Use either trace_every or trace_window, not both")
+        self.bin_width = bin_width
+        self.num_bins = int(np.ceil(max_age / bin_width))
+        self.hist = np.zeros(self.num_bins + 1, dtype=np.int64)  # Last bin collects ages >= max_age
+
+        self.count = 0
+        self.mean = 0.0
+        self.M2 = 0.0  # Sum of squared deviations from the mean
+        self.max = 0
+        self.current = 0  # Most recent AoI sample
+        self.num_peaks = 0
+        self.peak_sum = 0.0
+
+        self.trace_every = trace_every
+        self.trace_window = trace_window
+        self.trace_time = []
+        self.trace_values = []
+        self.trace_min = []
+        self.window_min = None  # Min/max of the window that is still open
+        self.window_max = None
+
+    def update(self, age):
+        """Record a single AoI sample."""
+        if age < self.current:
+            self.num_peaks += 1
+            self.peak_sum += self.current
+
+        self.count += 1
+        delta = age - self.mean
+        self.mean += delta / self.count
+        self.M2 += delta * (age - self.mean)
+        if age > self.max:
+            self.max = age
+        self.hist[min(int(age // self.bin_width), self.num_bins)] += 1
+
+        if self.trace_every is not None and (self.count - 1) % self.trace_every == 0:
+            self.trace_time.append(self.count - 1)
+            self.trace_values.append(age)
+        elif self.trace_window is not None:
+            self.window_min = age if self.window_min is None else min(self.window_min, age)
+            self.window_max = age if self.window_max is None else max(self.window_max, age)
+            if self.count % self.trace_window == 0:
+                self.trace_time.append(self.count - self.trace_window)
+                self.trace_min.append(self.window_min)
+                self.trace_values.append(self.window_max)
+                self.window_min = None
+                self.window_max = None
+
+        self.current = age
+
+    def update_many(self, ages):
+        """Record a consecutive block of AoI samples."""
+        ages = np.asarray(ages)
+        n = len(ages)
+        if n == 0:
+            return
+        start = self.count
+
+        previous = np.concatenate(([self.current], ages[:-1]))
+        drops = ages < previous
+        self.num_peaks += int(np.count_nonzero(drops))
+        self.peak_sum += float(previous[drops].sum())
+
+        # Merge the block mean/variance into the running ones (Chan et al.)
+        block_mean = float(ages.mean())
+        block_M2 = float(((ages - block_mean) ** 2).sum())
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.M2 += block_M2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        self.max = max(self.max, int(ages.max()))
+        bins = np.minimum(ages // self.bin_width, self.num_bins).astype(np.int64)
+        self.hist += np.bincount(bins, minlength=self.num_bins + 1)
+
+        if self.trace_every is not None:
+            first = -start % self.trace_every
+            self.trace_time.append(np.arange(start + first, start + n, self.trace_every))
+            self.trace_values.append(ages[first::self.trace_every])
+        elif self.trace_window is not None:
+            self._update_windows(start, ages)
+
+        self.current = ages[-1].item()
+
+    def _update_windows(self, start, ages):
+        w = self.trace_window
+        # Complete the window left open by the previous call
+        head = -start % w
+        if head:
+            block = ages[:head]
+            self.window_min = min(self.window_min, block.min().item())
+            self.window_max = max(self.window_max, block.max().item())
+            if len(block) < head:
+                return
+            self.trace_time.append(np.array([start + head - w]))
+            self.trace_min.append(np.array([self.window_min]))
+            self.trace_values.append(np.array([self.window_max]))
+            self.window_min = None
+            self.window_max = None
+
+        rest = ages[head:]
+        full = len(rest) // w
+        if full:
+            windows = rest[:full * w].reshape(full, w)
+            self.trace_time.append(start + head + w * np.arange(full))
+            self.trace_min.append(windows.min(axis=1))
+            self.trace_values.append(windows.max(axis=1))
+        tail = rest[full * w:]
+        if len(tail):
+            self.window_min = tail.min().item()
+            self.window_max = tail.max().item()
+
+    def get_state(self):
+        """Copy of the accumulated statistics and trace, for set_state (e.g. after a checkpoint)."""
+        return copy.deepcopy(self.__dict__)
+
+    def set_state(self, state):
+        self.__dict__.update(copy.deepcopy(state))
+
+    @property
+    def variance(self):
+        return self.M2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def mean_peak(self):
+        return self.peak_sum / self.num_peaks if self.num_peaks > 0 else float(self.current)
+
+    def quantile(self, q):
+        """Approximate quantile(s) from the histogram, interpolating linearly inside a bin."""
+        q = np.asarray(q, dtype=float)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)[()]
+        cumulative = np.cumsum(self.hist)
+        target = q * self.count
+        idx = np.minimum(np.searchsorted(cumulative, target, side='left'), self.num_bins)
+        below = np.where(idx > 0, cumulative[idx - 1], 0)
+        fraction = (target - below) / np.maximum(self.hist[idx], 1)
+        values = (idx + np.clip(fraction, 0, 1)) * self.bin_width
+        # Ages beyond the histogram range are reported as the observed maximum
+        values = np.where(idx == self.num_bins, self.max, np.minimum(values, self.max))
+        return values[()]
+
+    def trace(self):
+        """
+        Return the decimated trace as (time, AoI) or, in window mode, (time, AoI_max, AoI_min).
+        """
+        time = np.concatenate([np.atleast_1d(t) for t in self.trace_time]) if self.trace_time else np.array([])
+        values = np.concatenate([np.atleast_1d(v) for v in self.trace_values]) if self.trace_values else np.array([])
+        if self.trace_window is None:
+            return time, values
+        minimum = np.concatenate([np.atleast_1d(v) for v in self.trace_min]) if self.trace_min else np.array([])
+        return time, values, minimum
+
+    def summary(self):
+        return {
+            'mean': self.mean,
+            'variance': self.variance,
+            'max': self.max,
+            'mean_peak': self.mean_peak,
+            'median': float(self.quantile(0.5)),
+            'p95': float(self.quantile(0.95)),
+            'p99': float(self.quantile(0.99)),
+        }
@@ -1,8 +1,22 @@
+import os
 import random
-import simpy
-import matplotlib.pyplot as plt
+import sys
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from plotting import show_figure
+from simulation.ALOHA.aoi_stats import AoIStatistics
+from simulation.crn import DECISION, crn_seed, node_keys, paired_comparison, uniforms
+from simulation.checkpoint import run_checkpointed
+from simulation.output_analysis import OutputAnalyzer
+
+# Upper bound on the number of transmit decisions drawn per chunk by the vectorized engine
+CHUNK_ELEMENTS = 1 << 22
+# Slots drawn per chunk by the aggregate engine
+AGGREGATE_CHUNK = 1 << 20
+# Points of the AoL trace of simulated_aoi_data when no decimation is given
+TRACE_POINTS = 1000
+
 class Node:
     def __init__(self, env, p):
         self.env = env
@@ -41,9 +55,9 @@ def slotted_aloha(env, nodes):
             node_sent = transmitting_nodes[0]
             #if node_sent.last_generated_time is not None:
             Node.MsgsSent += 1
-            Node.AoL.append(min(env.now - node_sent.last_generated_time, Node.AoL[-1] + 1))
+            Node.AoL.update(min(env.now - node_sent.last_generated_time, Node.AoL.current + 1))
         else:
-            Node.AoL.append(Node.AoL[-1] + 1)  # AoL increments if no new message is received
+            Node.AoL.update(Node.AoL.current + 1)  # AoL increments if no new message is received
 
         '''
         if Received_msg[Node.Slots] == True:
@@ -56,28 +70,245 @@ def slotted_aloha(env, nodes):
         Node.Slots += 1
 
 
-def run_simulation(N=20, P=0.2, MaxSimtime=10000.0):
+class VectorizedSlottedAloha:
+    """
+    Slot-synchronous NumPy engine for slotted ALOHA without retransmission.
+    The Bernoulli(P) decisions of all N nodes are drawn for a chunk of slots at once as a
+    chunk x N matrix, single-transmitter slots are found with a row reduction and the AoL
+    recursion is applied to the whole chunk in bulk.
+    An OutputAnalyzer, if given, receives the per-slot successes ('throughput') and AoL ('aol').
+    With a crn_seed the decision of node i in slot t is U(i, t) < P for a counter-based uniform
+    (simulation.crn), the same in runs with other P, so paired runs share their randomness.
+    """
+    def __init__(self, N, P, rng=None, chunk=None, aoi=None, analyzer=None, crn_seed=None):
+        self.N = N
+        self.P = P
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.crn_seed = crn_seed
+        self.decision_keys = None if crn_seed is None else node_keys(crn_seed, DECISION, np.arange(N))
+        self.chunk = chunk or max(1, CHUNK_ELEMENTS // max(N, 1))
+        self.MsgsGenerated = 0
+        self.MsgsSent = 0
+        self.Slots = 0
+        if aoi is None:
+            aoi = AoIStatistics()
+            aoi.update(0)  # AoL = 0 at time 0
+        self.AoL = aoi
+        self.analyzer = analyzer
+
+    def run(self, num_slots):
+        remaining = num_slots
+        while remaining > 0:
+            n = min(self.chunk, remaining)
+            self.step(n)
+            remaining -= n
+
+    def step(self, n):
+        """Simulate the next n slots."""
+        # One row per slot, so the decision of node i in slot t does not depend on the chunk size
+        if self.crn_seed is None:
+            transmitting = self.rng.random((n, self.N)) < self.P
+        else:
+            slots = np.arange(self.Slots + 1, self.Slots + n + 1)
+            transmitting = uniforms(self.decision_keys[None, :], slots[:, None]) < self.P
+        counts = np.count_nonzero(transmitting, axis=1)
+        success = counts == 1
+
+        self.MsgsGenerated += int(counts.sum())
+        self.MsgsSent += int(np.count_nonzero(success))
+
+        # AoL drops to 0 in a successful slot and grows by 1 otherwise
+        idx = np.arange(1, n + 1)
+        last_success = np.maximum.accumulate(np.where(success, idx, 0))
+        ages = np.where(last_success > 0, idx - last_success, self.AoL.current + idx)
+        self.AoL.update_many(ages)
+        self.Slots += n
+        if self.analyzer is not None:
+            self.analyzer.add('throughput', success)
+            self.analyzer.add('aol', ages)
+
+    def get_state(self):
+        """Counters, AoL statistics and RNG state, enough to continue the run bit-exactly."""
+        return {
+            'N': self.N, 'P': self.P, 'chunk': self.chunk, 'crn_seed': self.crn_seed,
+            'MsgsGenerated': self.MsgsGenerated, 'MsgsSent': self.MsgsSent, 'Slots': self.Slots,
+            'rng': self.rng.bit_generator.state,
+            'AoL': self.AoL.get_state(),
+            'analyzer': None if self.analyzer is None else self.analyzer.get_state(),
+        }
+
+    def set_state(self, state):
+        if (state['N'], state['P']) != (self.N, self.P):
+            raise ValueError(f"Checkpoint is for N={state['N']}, P={state['P']}, not N={self.N}, P={self.P}")
+        if state['crn_seed'] != self.crn_seed:
+            raise ValueError("Checkpoint was written with a different CRN seed")
+        self.chunk = state['chunk']
+        self.MsgsGenerated = state['MsgsGenerated']
+        self.MsgsSent = state['MsgsSent']
+        self.Slots = state['Slots']
+        self.rng.bit_generator.state = state['rng']
+        self.AoL.set_state(state['AoL'])
+        if self.analyzer is not None and state['analyzer'] is not None:
+            self.analyzer.set_state(state['analyzer'])
+
+
+class AggregateSlottedAloha(VectorizedSlottedAloha):
+    """
+    Population-level engine: only the number of transmitters of each slot, Binomial(N, P), is
+    drawn, so the cost per slot does not depend on N (10^8 nodes cost as much as 10). The
+    identity of the transmitter of a successful slot, uniform over the N nodes, is drawn only
+    if record_winners is set and only for those slots; winners() returns (slots, node ids).
+    Counters, AoL, analyzer and checkpoint state are those of VectorizedSlottedAloha.
+    """
+    def __init__(self, N, P, rng=None, chunk=None, aoi=None, analyzer=None, record_winners=False):
+        super().__init__(N, P, rng, chunk or AGGREGATE_CHUNK, aoi, analyzer)
+        self.record_winners = record_winners
+        self.winner_slots = []
+        self.winner_ids = []
+
+    def step(self, n):
+        """Simulate the next n slots."""
+        counts = self.rng.binomial(self.N, self.P, n)
+        success = counts == 1
+
+        self.MsgsGenerated += int(counts.sum())
+        self.MsgsSent += int(np.count_nonzero(success))
+        if self.record_winners:
+            slots = self.Slots + 1 + np.flatnonzero(success)
+            self.winner_slots.append(slots)
+            self.winner_ids.append(self.rng.integers(0, self.N, len(slots)))
+
+        idx = np.arange(1, n + 1)
+        last_success = np.maximum.accumulate(np.where(success, idx, 0))
+        ages = np.where(last_success > 0, idx - last_success, self.AoL.current + idx)
+        self.AoL.update_many(ages)
+        self.Slots += n
+        if self.analyzer is not None:
+            self.analyzer.add('throughput', success)
+            self.analyzer.add('aol', ages)
+
+    def winners(self):
+        """Slot and node id of every successful transmission so far (with record_winners)."""
+        if not self.winner_slots:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        return np.concatenate(self.winner_slots), np.concatenate(self.winner_ids)
+
+    def get_state(self):
+        state = super().get_state()
+        state['winners'] = self.winners() if self.record_winners else None
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        if self.record_winners and state['winners'] is not None:
+            self.winner_slots, self.winner_ids = [state['winners'][0]], [state['winners'][1]]
+
+
+def run_simulation(N=20, P=0.2, MaxSimtime=10000.0, backend='simpy', seed=None,
+                   trace_every=None, trace_window=None, verbose=True, instrumentation=None,
+                   checkpoint=None, checkpoint_every=10 ** 7, rel_precision=None, check_every=10 ** 6, crn=False,
+                   record_winners=False):
+    """
+    backend='simpy' runs one process per node, backend='numpy' runs VectorizedSlottedAloha
+    over the same slots (t = 1, 2, ... < MaxSimtime) and backend='aggregate' runs
+    AggregateSlottedAloha, whose cost does not depend on N; with record_winners it leaves the
+    slots and node ids of the successful transmissions in Node.Winners.
+    AoL is accumulated in an AoIStatistics object; only the decimated trace selected by
+    trace_every / trace_window is kept for plotting (both None, the default, keeps no trace).
+    Returns the results as a dict; verbose=False skips the printout and the plot of the trace.
+    An Instrumentation object records the events and queue length of a simpy run.
+    With the numpy or aggregate backend, checkpoint names a file the engine state is saved to
+    every checkpoint_every slots; rerunning with the same arguments resumes from it.
+    With rel_precision (numpy or aggregate backend) MaxSimtime is only an upper bound: every check_every slots
+    the warm-up is truncated (MSER-5) and the run stops once the batch-means confidence intervals
+    of the throughput and the AoL are within rel_precision of their means.
+    crn=True (numpy backend) draws the decisions as common random numbers keyed by seed, node and
+    slot, so runs with the same seed and neighbouring P can be compared pairwise (see compare).
+    """
     # Reset class variables
     Node.NextID = 0
     Node.MsgsSent = 0
     Node.MsgsGenerated = 0
     Node.Slots = 0
-    Node.AoL = [0]
+    Node.AoL = AoIStatistics(trace_every=trace_every, trace_window=trace_window)
+    Node.AoL.update(0)
+    Node.Winners = None
     #Node.ReceivedMsg = [False] * MaxSimtime
 
-    # Create simulation environment
-    env = simpy.Environment()
+    if backend in ('numpy', 'aggregate'):
+        analyzer = OutputAnalyzer() if rel_precision is not None else None
+        if backend == 'numpy':
+            engine = VectorizedSlottedAloha(N, P, rng=np.random.default_rng(seed), aoi=Node.AoL, analyzer=analyzer,
+                                            crn_seed=crn_seed(seed) if crn else None)
+        elif crn:
+            raise ValueError("Common random numbers need the numpy backend")
+        else:
+            engine = AggregateSlottedAloha(N, P, rng=np.random.default_rng(seed), aoi=Node.AoL, analyzer=analyzer,
+                                           record_winners=record_winners)
+        num_slots = int(np.ceil(MaxSimtime)) - 1
+        if checkpoint is None and analyzer is None:
+            engine.run(num_slots)
+        else:
+            every = min(checkpoint_every if checkpoint is not None else num_slots,
+                        check_every if analyzer is not None else num_slots)
+            # Whole chunks between stops, so a resumed run merges the AoL blocks exactly as an uninterrupted one
+            every = max(1, -(-every // engine.chunk)) * engine.chunk
+            done = (lambda e: analyzer.converged(rel_precision)) if analyzer is not None else None
+            run_checkpointed(engine, lambda e: e.Slots, lambda e, stop: e.run(stop - e.Slots), num_slots, checkpoint,
+                             every, done)
+        Node.MsgsSent = engine.MsgsSent
+        Node.MsgsGenerated = engine.MsgsGenerated
+        Node.Slots = engine.Slots
+        if backend == 'aggregate' and record_winners:
+            Node.Winners = engine.winners()
+    elif backend == 'simpy':
+        import simpy  # Only the event-driven backend needs SimPy
+
+        if checkpoint is not None:
+            raise ValueError("Checkpointing needs the numpy backend (SimPy process state cannot be saved)")
+        if rel_precision is not None:
+            raise ValueError("Precision-based stopping needs the numpy backend")
+        if crn:
+            raise ValueError("Common random numbers need the numpy backend")
+        if seed is not None:
+            random.seed(seed)
+
+        # Create simulation environment
+        env = simpy.Environment()
 
-    # Create and activate nodes
-    nodes = [Node(env, P) for _ in range(N)]
-    for node in nodes:
-        env.process(node.run())
+        # Create and activate nodes
+        nodes = [Node(env, P) for _ in range(N)]
+        for node in nodes:
+            env.process(node.run())
 
-    # Start slotted ALOHA process
-    env.process(slotted_aloha(env, nodes))
+        # Start slotted ALOHA process
+        env.process(slotted_aloha(env, nodes))
 
-    # Run simulation
-    env.run(until=MaxSimtime)
+        # Run simulation
+        if instrumentation is None:
+            env.run(until=MaxSimtime)
+        else:
+            instrumentation.run(env, MaxSimtime)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    results = {
+        'N': N,
+        'P': P,
+        'slots': Node.Slots,
+        'msgs_generated': Node.MsgsGenerated,
+        'msgs_sent': Node.MsgsSent,
+        'throughput': Node.MsgsSent / Node.Slots if Node.Slots > 0 else 0,
+        'success_rate': Node.MsgsSent / Node.MsgsGenerated if Node.MsgsGenerated > 0 else 0,
+        'aol_mean': Node.AoL.mean,
+        'aol_std': float(np.sqrt(Node.AoL.variance)),
+        'aol_mean_peak': Node.AoL.mean_peak,
+        'aol_max': Node.AoL.max,
+    }
+    if backend != 'simpy' and analyzer is not None:
+        results.update(analyzer.results())
+    if not verbose:
+        return results
 
     # Print results
     print(f"\nSimulation Results:")
@@ -87,19 +318,67 @@ def run_simulation(N=20, P=0.2, MaxSimtime=10000.0):
     print(f"  Total Msgs Sent: {Node.MsgsSent}")
     print(f"  Mean Throughput: {Node.MsgsSent/Node.Slots:.4f}")
     print(f"  Message Success Rate: {Node.MsgsSent/Node.MsgsGenerated*100:.2f}%")
+    print(f"  Mean AoL: {Node.AoL.mean:.4f} (std {np.sqrt(Node.AoL.variance):.4f})")
+    print(f"  Mean Peak AoL: {Node.AoL.mean_peak:.4f}, Max AoL: {Node.AoL.max}")
+    print(f"  AoL Quantiles (50/95/99%): {Node.AoL.quantile(0.5):.1f} / {Node.AoL.quantile(0.95):.1f} / {Node.AoL.quantile(0.99):.1f}")
+    if 'throughput_steady' in results:
+        print(f"  Steady state (warm-up {results['throughput_warmup']} slots): "
+              f"throughput {results['throughput_steady']:.4f} +/- {results['throughput_half_width']:.4f}, "
+              f"AoL {results['aol_steady']:.4f} +/- {results['aol_half_width']:.4f}")
     print('\n')
 
-    plot_aoi_vs_time(Node.AoL, np.arange(len(Node.AoL)))
+    if trace_window is not None:
+        time, AoI, AoI_min = Node.AoL.trace()
+        plot_aoi_vs_time(AoI, time, AoI_min)
+    elif trace_every is not None:
+        time, AoI = Node.AoL.trace()
+        plot_aoi_vs_time(AoI, time)
+    return results
+
+def compare(params_a, params_b, replications=10, seed=None, metrics=('throughput', 'success_rate', 'aol_mean'),
+            confidence=0.95, **common):
+    """
+    Paired comparison of two parameter sets (e.g. {'P': 0.05} and {'P': 0.06}) on the numpy
+    backend with common random numbers: the difference b - a of each metric with its confidence
+    half-width, next to the half-width of independent runs (see simulation.crn.paired_comparison).
+    The other run_simulation arguments are given in common.
+    """
+    def run(seed, **params):
+        kwargs = dict(common, **params)
+        return run_simulation(backend='numpy', seed=seed, trace_every=None, verbose=False, crn=True, **kwargs)
+
+    return paired_comparison(run, params_a, params_b, replications, seed, list(metrics), confidence)
 
-def plot_aoi_vs_time(AoI, time):
-    plt.plot(time, AoI, ls='-')
-    plt.xlabel('Time Slot')
-    plt.ylabel('Age of Information (AoI)')
-    plt.title('AoI vs. Time')
-    plt.grid()
-    plt.show()
+def aoi_vs_time_data(AoI, time, AoI_min=None):
+    """Figure spec of an AoL trace."""
+    series = []
+    if AoI_min is not None:
+        # Decimated trace: shade the min/max envelope of each window
+        series.append({'x': time, 'y': AoI, 'y2': AoI_min})
+    series.append({'x': time, 'y': AoI})
+    return {'title': 'AoI vs. Time', 'xlabel': 'Time Slot', 'ylabel': 'Age of Information (AoI)', 'series': series}
+
+def simulated_aoi_data(N=10, P=0.01, MaxSimtime=10000.0, backend='numpy', seed=None, trace_every=None, trace_window=None):
+    """
+    Run the model without output and return the figure spec of its AoL trace; without
+    trace_every or trace_window the trace is the min/max of windows giving TRACE_POINTS points.
+    """
+    if trace_every is None and trace_window is None:
+        trace_window = max(1, int(MaxSimtime) // TRACE_POINTS)
+    run_simulation(N, P, MaxSimtime, backend, seed, trace_every, trace_window, verbose=False)
+    time, AoI, *AoI_min = Node.AoL.trace()
+    return aoi_vs_time_data(AoI, time, *AoI_min)
+
+def plot_aoi_vs_time(AoI, time, AoI_min=None):
+    show_figure(aoi_vs_time_data(AoI, time, AoI_min))
 
 
 if __name__ == '__main__':
-    # Example usage
-    run_simulation(N=10, P=0.01, MaxSimtime=100.0)
+    # Example usage, keeping the full trace to plot it
+    run_simulation(N=10, P=0.01, MaxSimtime=100.0, trace_every=1)
+
+    # Same model on the vectorized engine
+    run_simulation(N=10, P=0.01, MaxSimtime=100.0, backend='numpy')
+
+    # Massive population on the aggregate engine
+    run_simulation(N=10 ** 8, P=1e-8, MaxSimtime=10 ** 6, backend='aggregate')
@@ -1,16 +1,26 @@
+import os
+import sys
 import numpy as np
-import simpy
-from prettytable import PrettyTable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from simulation.checkpoint import run_checkpointed
+from simulation.crn import ARRIVAL, BACKOFF, WINNER, crn_seed, node_keys, paired_comparison, uniforms
+from simulation.output_analysis import OutputAnalyzer
+from simulation.random_streams import RandomStream, spawn_streams
 
 NUM_NODES = 10  # Number of nodes
 SIM_TIME = 10000  # Total simulation time
 SLOT_TIME = 1  # Time duration of each slot
 LAMBDA = 0.1  # Average arrival rate for Poisson distribution
+BACKOFF_MAX = 10  # Retries wait randint(1, BACKOFF_MAX) slots
 
 class Node:
-    def __init__(self, env, name):
+    def __init__(self, env, name, lam=LAMBDA, stream=None, backoff_max=BACKOFF_MAX):
         self.env = env
         self.name = name
+        self.lam = lam
+        self.backoff_max = backoff_max
+        self.stream = stream if stream is not None else RandomStream()
         self.message_arrival_time = None
         self.retry_time = None
         self.initial_transmissions = 0
@@ -24,7 +34,7 @@ class Node:
     def generate_message(self):
         while True:
             # Generate message arrival time using Poisson distribution
-            inter_arrival_time = np.random.exponential(1 / LAMBDA)
+            inter_arrival_time = self.stream.exponential(1 / self.lam)
             yield self.env.timeout(inter_arrival_time)
             self.message_arrival_time = self.env.now
             self.initial_transmissions += 1
@@ -48,84 +58,415 @@ class Node:
             else:
                 # Wait for a random backoff time before retrying
                 self.retries += 1
-                retry_time = np.random.randint(1, 10) * SLOT_TIME
+                retry_time = self.stream.integers(1, self.backoff_max) * SLOT_TIME
                 self.total_retry_time += retry_time
                 self.total_schedule_time += retry_time
                 yield self.env.timeout(retry_time)
 
 class Channel:
-    slots = {}
+    """
+    Each slot is settled as soon as the next one opens, so only running counters are kept:
+    successful slots, total attempts and the number of collided slots per collision size.
+    An optional per-slot history of attempt counts goes into a preallocated ring buffer.
+    """
+    current_slot = None
+    current_attempts = 0  # Attempts in the slot that is still open
+    successes = 0
+    attempts = 0
+    collisions = {}  # Collision size -> number of slots
+    history = None
+    last_recorded = -1  # Last slot written to the history
+
+    @staticmethod
+    def reset(history=None):
+        """history: number of slots to keep attempt counts for (a ring buffer if shorter than the run)."""
+        Channel.current_slot = None
+        Channel.current_attempts = 0
+        Channel.successes = 0
+        Channel.attempts = 0
+        Channel.collisions = {}
+        Channel.history = np.zeros(history, dtype=np.int32) if history else None
+        Channel.last_recorded = -1
+
+    @staticmethod
+    def record_slot(slot, attempts):
+        """Settle a closed slot with the given number of attempts."""
+        Channel.attempts += attempts
+        if attempts == 1:
+            Channel.successes += 1
+        elif attempts > 1:
+            Channel.collisions[attempts] = Channel.collisions.get(attempts, 0) + 1
+        if Channel.history is not None:
+            Channel.clear_history(slot)
+            Channel.history[slot % len(Channel.history)] = attempts
+            Channel.last_recorded = slot
+
+    @staticmethod
+    def clear_history(slot):
+        """Zero the history of the idle slots between the last recorded one and `slot`."""
+        size = len(Channel.history)
+        if slot - Channel.last_recorded > size:
+            Channel.history[:] = 0
+        else:
+            Channel.history[np.arange(Channel.last_recorded + 1, slot) % size] = 0
+
+    @staticmethod
+    def settle(last_slot=None):
+        """Settle the open slot, e.g. before reporting; last_slot marks the end of the run in the history."""
+        if Channel.current_attempts:
+            Channel.record_slot(Channel.current_slot, Channel.current_attempts)
+        Channel.current_attempts = 0
+        if Channel.history is not None and last_slot is not None and last_slot > Channel.last_recorded:
+            Channel.clear_history(last_slot + 1)
+            Channel.last_recorded = last_slot
+
+    @staticmethod
+    def get_state():
+        return {
+            'current_slot': Channel.current_slot, 'current_attempts': Channel.current_attempts,
+            'successes': Channel.successes, 'attempts': Channel.attempts, 'collisions': dict(Channel.collisions),
+            'history': None if Channel.history is None else Channel.history.copy(),
+            'last_recorded': Channel.last_recorded,
+        }
 
     @staticmethod
-    def reset():
-        Channel.slots = {}
+    def set_state(state):
+        Channel.current_slot = state['current_slot']
+        Channel.current_attempts = state['current_attempts']
+        Channel.successes = state['successes']
+        Channel.attempts = state['attempts']
+        Channel.collisions = dict(state['collisions'])
+        Channel.history = None if state['history'] is None else state['history'].copy()
+        Channel.last_recorded = state['last_recorded']
 
     @staticmethod
     def attempt_transmission(node):
-        current_slot = node.env.now
+        # Integer slot index, so float drift in env.now cannot split one slot in two
+        current_slot = round(node.env.now / SLOT_TIME)
+        if current_slot != Channel.current_slot:
+            Channel.settle()
+            Channel.current_slot = current_slot
 
         # Check if any other node is transmitting in this slot
-        if current_slot not in Channel.slots:
-            Channel.slots[current_slot] = [node]
-        else:
-            Channel.slots[current_slot].append(node)
+        Channel.current_attempts += 1
 
-        if len(Channel.slots[current_slot]) == 1:
+        if Channel.current_attempts == 1:
             # Successful transmission
-            delay = current_slot - node.message_arrival_time
+            delay = node.env.now - node.message_arrival_time
             node.total_delay += delay
             node.message_arrival_time = None
         else:
             # Collision occurred
             pass  # Do not reset message_arrival_time
 
-# Reporting function
-def generate_report(nodes):
-    successful_transmissions = 0
-    total_transmissions = 0
+def last_slot(sim_time):
+    """Index of the last slot that starts before sim_time."""
+    return int(np.ceil(sim_time / SLOT_TIME)) - 1
+
+class VectorizedSlottedAloha:
+    """
+    Slot-synchronous NumPy engine for the same model: per-node state is kept in arrays (has-packet
+    flag, arrival time, countdown to the next attempt and counters) and all nodes advance one slot
+    at a time. A message arriving at time a is first sent in slot floor(a) + 3 (slot alignment plus
+    the 2-slot wait), a failed attempt in slot t is retried in slot t + randint(1, backoff_max) + 3.
+    As in Channel.attempt_transmission, the first node to occupy a slot clears its message even
+    when the slot collides; here that node is picked at random among the colliding ones.
+    An OutputAnalyzer, if given, receives the per-slot successes ('throughput') and the delay of
+    every delivered message ('delay').
+    With a crn_seed the randomness comes from counter-based uniforms (simulation.crn) keyed by
+    node and message number (arrivals), node and retry number (backoffs) and slot (the winner of
+    a collision), so runs with other lam or backoff_max reuse the same numbers for the same events.
+    """
+    def __init__(self, num_nodes=NUM_NODES, lam=LAMBDA, rng=None, analyzer=None, backoff_max=BACKOFF_MAX,
+                 crn_seed=None):
+        self.num_nodes = num_nodes
+        self.lam = lam
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.backoff_max = backoff_max
+        self.crn_seed = crn_seed
+        if crn_seed is not None:
+            self.keys = {stream: node_keys(crn_seed, stream, np.arange(num_nodes)) for stream in (ARRIVAL, BACKOFF)}
+            self.winner_key = node_keys(crn_seed, WINNER, 0)
+        self.slot = 0  # Last simulated slot
+        self.analyzer = analyzer
+        self.observed_success = []  # Observations of the current advance(), handed to the analyzer at its end
+        self.observed_delay = []
+
+        self.has_packet = np.zeros(num_nodes, dtype=bool)
+        self.countdown = np.zeros(num_nodes, dtype=np.int64)  # Slots until the next attempt
+
+        self.initial_transmissions = np.zeros(num_nodes, dtype=np.int64)
+        self.retries = np.zeros(num_nodes, dtype=np.int64)
+        self.successful_transmissions = np.zeros(num_nodes, dtype=np.int64)
+        self.arrival_time = self.inter_arrival(np.arange(num_nodes))  # Current or next message arrival
+        self.total_delay = np.zeros(num_nodes)
+        self.total_retry_time = np.zeros(num_nodes, dtype=np.int64)
+        self.total_schedule_time = np.zeros(num_nodes, dtype=np.int64)
+
+    # Per-node arrays saved by get_state
+    ARRAYS = ('has_packet', 'arrival_time', 'countdown', 'initial_transmissions', 'retries',
+              'successful_transmissions', 'total_delay', 'total_retry_time', 'total_schedule_time')
+
+    def run(self, sim_time=SIM_TIME):
+        """Advance to sim_time: attempts happen in slots t < sim_time."""
+        self.advance(last_slot(sim_time))
+        self.finish(sim_time)
+
+    def advance(self, slot):
+        """Simulate up to and including `slot`."""
+        while self.slot < slot:
+            self.step()
+        if self.analyzer is not None:
+            self.analyzer.add('throughput', self.observed_success)
+            self.analyzer.add('delay', self.observed_delay)
+            self.observed_success.clear()
+            self.observed_delay.clear()
+
+    def finish(self, sim_time=SIM_TIME):
+        """Close the run at sim_time (once, after the last advance)."""
+        # Messages that arrived in the last partial slot are generated but never sent
+        pending = ~self.has_packet & (self.arrival_time < sim_time)
+        self.initial_transmissions += pending
+        Channel.settle(self.slot)
+
+    def step(self):
+        t = self.slot = self.slot + 1
+        self.countdown -= self.has_packet
+
+        arrived = ~self.has_packet & (self.arrival_time <= t)
+        if arrived.any():
+            self.has_packet |= arrived
+            self.initial_transmissions += arrived
+            self.countdown[arrived] = np.floor(self.arrival_time[arrived]).astype(np.int64) + 3 - t
+
+        attempting = np.flatnonzero(self.has_packet & (self.countdown == 0))
+        n = len(attempting)
+        if self.analyzer is not None:
+            self.observed_success.append(n == 1)
+        if n == 0:
+            return
+        Channel.record_slot(t, n)
+        if n == 1:
+            winner = attempting[0]
+        else:
+            winner = attempting[self.pick_winner(t, n)]
+            failed = attempting[attempting != winner]
+            backoff = self.backoff(failed) * SLOT_TIME
+            self.retries[failed] += 1
+            self.total_retry_time[failed] += backoff
+            self.total_schedule_time[failed] += backoff
+            self.countdown[failed] = backoff + 3
+
+        self.successful_transmissions[winner] += 1
+        self.total_delay[winner] += t - self.arrival_time[winner]
+        if self.analyzer is not None:
+            self.observed_delay.append(t - self.arrival_time[winner])
+        self.has_packet[winner] = False
+        self.arrival_time[winner] = t + self.inter_arrival(winner)
+
+    def inter_arrival(self, nodes):
+        """Time to the next message of each node (a scalar for a single node), numbered by its deliveries."""
+        if self.crn_seed is None:
+            return self.rng.exponential(1 / self.lam, np.shape(nodes) or None)
+        u = uniforms(self.keys[ARRIVAL][nodes], self.successful_transmissions[nodes])
+        return -np.log1p(-u) / self.lam
+
+    def pick_winner(self, t, n):
+        """Index of the node among the n colliding in slot t that clears its message."""
+        if self.crn_seed is None:
+            return self.rng.integers(n)
+        return int(uniforms(self.winner_key, t) * n)
+
+    def backoff(self, failed):
+        """randint(1, backoff_max) backoff slots of the failed nodes, numbered by their retries."""
+        if self.crn_seed is None:
+            return self.rng.integers(1, self.backoff_max, size=len(failed))
+        u = uniforms(self.keys[BACKOFF][failed], self.retries[failed])
+        return 1 + (u * (self.backoff_max - 1)).astype(np.int64)
+
+    def get_state(self):
+        """Node arrays, channel counters and RNG state, enough to continue the run bit-exactly."""
+        state = {name: getattr(self, name).copy() for name in self.ARRAYS}
+        state.update(num_nodes=self.num_nodes, lam=self.lam, backoff_max=self.backoff_max, crn_seed=self.crn_seed,
+                     slot=self.slot,
+                     rng=self.rng.bit_generator.state, channel=Channel.get_state(),
+                     analyzer=None if self.analyzer is None else self.analyzer.get_state())
+        return state
+
+    def set_state(self, state):
+        if (state['num_nodes'], state['lam']) != (self.num_nodes, self.lam):
+            raise ValueError(f"Checkpoint is for num_nodes={state['num_nodes']}, lam={state['lam']}, "
+                             f"not num_nodes={self.num_nodes}, lam={self.lam}")
+        if (state['backoff_max'], state['crn_seed']) != (self.backoff_max, self.crn_seed):
+            raise ValueError("Checkpoint was written with a different backoff_max or CRN seed")
+        for name in self.ARRAYS:
+            setattr(self, name, state[name].copy())
+        self.slot = state['slot']
+        self.rng.bit_generator.state = state['rng']
+        Channel.set_state(state['channel'])
+        if self.analyzer is not None and state['analyzer'] is not None:
+            self.analyzer.set_state(state['analyzer'])
+
+    def results(self, sim_time=SIM_TIME):
+        retries = int(self.retries.sum())
+        delivered = int(self.successful_transmissions.sum())
+        return {
+            'num_nodes': self.num_nodes,
+            'lam': self.lam,
+            'sim_time': sim_time,
+            'initial_transmissions': int(self.initial_transmissions.sum()),
+            'retries': retries,
+            'total_transmissions': Channel.attempts,
+            'successful_transmissions': Channel.successes,
+            'collided_slots': sum(Channel.collisions.values()),
+            'delivered_messages': delivered,
+            'throughput': Channel.successes / (sim_time / SLOT_TIME),
+            'mean_delay': float(self.total_delay.sum()) / delivered if delivered > 0 else 0,
+            'mean_retry_time': int(self.total_retry_time.sum()) / retries if retries > 0 else 0,
+            'mean_schedule_time': int(self.total_schedule_time.sum()) / retries if retries > 0 else 0,
+        }
+
+def collect_results(nodes, num_nodes=NUM_NODES, lam=LAMBDA, sim_time=SIM_TIME):
+    """Summarize a finished run as a dict of metrics."""
     total_initial_transmissions = 0
+    total_delivered = 0
     total_retries = 0
     total_delay = 0
     total_retry_time = 0
     total_schedule_time = 0
 
-    for slot, transmitting_nodes in Channel.slots.items():
-        if len(transmitting_nodes) == 1:
-            successful_transmissions += 1
-        total_transmissions += len(transmitting_nodes)
+    Channel.settle(last_slot(sim_time))
+    successful_transmissions = Channel.successes
 
     for node in nodes:
         total_initial_transmissions += node.initial_transmissions
+        total_delivered += node.successful_transmissions
         total_retries += node.retries
         total_delay += node.total_delay
         total_retry_time += node.total_retry_time
         total_schedule_time += node.total_schedule_time
 
-    throughput = successful_transmissions / (SIM_TIME / SLOT_TIME)
-    mean_delay = total_delay / successful_transmissions if successful_transmissions > 0 else 0
-    mean_retry_time = total_retry_time / total_retries if total_retries > 0 else 0
-    mean_schedule_time = total_schedule_time / total_retries if total_retries > 0 else 0
+    return {
+        'num_nodes': num_nodes,
+        'lam': lam,
+        'sim_time': sim_time,
+        'initial_transmissions': total_initial_transmissions,
+        'retries': total_retries,
+        'total_transmissions': Channel.attempts,
+        'successful_transmissions': successful_transmissions,
+        'collided_slots': sum(Channel.collisions.values()),
+        'delivered_messages': total_delivered,
+        'throughput': successful_transmissions / (sim_time / SLOT_TIME),
+        'mean_delay': total_delay / total_delivered if total_delivered > 0 else 0,
+        'mean_retry_time': total_retry_time / total_retries if total_retries > 0 else 0,
+        'mean_schedule_time': total_schedule_time / total_retries if total_retries > 0 else 0,
+    }
+
+# Reporting function
+def generate_report(results):
+    from prettytable import PrettyTable  # Only needed for the printed report
 
     table = PrettyTable()
     table.field_names = ["Metric", "Value"]
-    table.add_row(["Number of Nodes", NUM_NODES])
-    table.add_row(["Lambda (Arrival Rate)", LAMBDA])
-    table.add_row(["Simulation Time", SIM_TIME])
-    table.add_row(["Initial Transmissions", total_initial_transmissions])
-    table.add_row(["Retries", total_retries])
-    table.add_row(["Total Transmissions", total_transmissions])
-    table.add_row(["Successful Transmissions", successful_transmissions])
-    table.add_row(["Throughput (packets/slot)", f"{throughput:.4f}"])
-    table.add_row(["Mean Delay (time units)", f"{mean_delay:.4f}"])
-    table.add_row(["Mean Retry Time (time units)", f"{mean_retry_time:.4f}"])
-    table.add_row(["Average Time Schedule (time units)", f"{mean_schedule_time:.4f}"])
+    table.add_row(["Number of Nodes", results['num_nodes']])
+    table.add_row(["Lambda (Arrival Rate)", results['lam']])
+    table.add_row(["Simulation Time", results['sim_time']])
+    table.add_row(["Initial Transmissions", results['initial_transmissions']])
+    table.add_row(["Retries", results['retries']])
+    table.add_row(["Total Transmissions", results['total_transmissions']])
+    table.add_row(["Successful Transmissions (single-attempt slots)", results['successful_transmissions']])
+    table.add_row(["Delivered Messages", results['delivered_messages']])
+    table.add_row(["Throughput (packets/slot)", f"{results['throughput']:.4f}"])
+    table.add_row(["Mean Delay per Delivered Message (time units)", f"{results['mean_delay']:.4f}"])
+    table.add_row(["Mean Retry Time (time units)", f"{results['mean_retry_time']:.4f}"])
+    table.add_row(["Average Time Schedule (time units)", f"{results['mean_schedule_time']:.4f}"])
+    if 'throughput_steady' in results:
+        table.add_row(["Warm-up (slots)", results['throughput_warmup']])
+        table.add_row(["Steady-state Throughput", f"{results['throughput_steady']:.4f} +/- {results['throughput_half_width']:.4f}"])
+        table.add_row(["Steady-state Delay per Delivered Message", f"{results['delay_steady']:.4f} +/- {results['delay_half_width']:.4f}"])
 
     print("\nSimulation Results:")
     print(table)
 
+def run_simulation(num_nodes=NUM_NODES, lam=LAMBDA, sim_time=SIM_TIME, seed=None, verbose=True, backend='simpy',
+                   history=None, instrumentation=None, checkpoint=None, checkpoint_every=10 ** 6,
+                   rel_precision=None, check_every=10 ** 4, backoff_max=BACKOFF_MAX, crn=False):
+    """
+    backend='simpy' runs one process per node, backend='numpy' runs VectorizedSlottedAloha.
+    history keeps the attempt counts of the last `history` slots in Channel.history.
+    An Instrumentation object records events, transmission-attempt and RNG time of a simpy run.
+    With the numpy backend, checkpoint names a file the engine state is saved to every
+    checkpoint_every slots; rerunning with the same arguments resumes from it.
+    With rel_precision (numpy backend) sim_time is only an upper bound: every check_every slots
+    the warm-up is truncated (MSER-5) and the run stops once the batch-means confidence intervals
+    of the throughput and the delay are within rel_precision of their means.
+    Retries back off randint(1, backoff_max) slots. crn=True (numpy backend) draws arrivals,
+    backoffs and collision winners as common random numbers keyed by seed, node and event number,
+    so runs with the same seed and neighbouring parameters can be compared pairwise (see compare).
+    Successful transmissions count the slots with a single attempt. A message is delivered by the
+    first attempt of its slot, so collided slots deliver one message too; mean_delay and
+    delay_steady both average over the delivered messages (delivered_messages).
+    """
+    Channel.reset(history)
+    if backend == 'numpy':
+        analyzer = OutputAnalyzer() if rel_precision is not None else None
+        engine = VectorizedSlottedAloha(num_nodes, lam, rng=np.random.default_rng(seed), analyzer=analyzer,
+                                        backoff_max=backoff_max, crn_seed=crn_seed(seed) if crn else None)
+        if checkpoint is None and analyzer is None:
+            engine.run(sim_time)
+        else:
+            every = min(checkpoint_every if checkpoint is not None else sim_time,
+                        check_every if analyzer is not None else sim_time)
+            done = (lambda e: analyzer.converged(rel_precision)) if analyzer is not None else None
+            run_checkpointed(engine, lambda e: e.slot, lambda e, stop: e.advance(stop), last_slot(sim_time),
+                             checkpoint, every, done)
+            if engine.slot < last_slot(sim_time):
+                sim_time = (engine.slot + 1) * SLOT_TIME  # Stopped early
+            engine.finish(sim_time)
+        results = engine.results(sim_time)
+        if analyzer is not None:
+            results.update(analyzer.results())
+    elif backend == 'simpy':
+        import simpy  # Only the event-driven backend needs SimPy
+
+        if checkpoint is not None:
+            raise ValueError("Checkpointing needs the numpy backend (SimPy process state cannot be saved)")
+        if rel_precision is not None:
+            raise ValueError("Precision-based stopping needs the numpy backend")
+        if crn:
+            raise ValueError("Common random numbers need the numpy backend")
+        env = simpy.Environment()
+        streams = spawn_streams(seed, num_nodes)
+        nodes = [Node(env, f"Node {i}", lam, streams[i], backoff_max) for i in range(num_nodes)]
+        if instrumentation is None:
+            env.run(until=sim_time)
+        else:
+            instrumentation.run(env, sim_time, hot=[(Channel, 'attempt_transmission'), (RandomStream, 'next')])
+
+        results = collect_results(nodes, num_nodes, lam, sim_time)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    if verbose:
+        generate_report(results)
+    return results
+
+def compare(params_a, params_b, replications=10, seed=None, metrics=('throughput', 'mean_delay', 'retries'),
+            confidence=0.95, **common):
+    """
+    Paired comparison of two parameter sets (e.g. {'backoff_max': 10} and {'backoff_max': 20}) on
+    the numpy backend with common random numbers: the difference b - a of each metric with its
+    confidence half-width, next to the half-width of independent runs (see
+    simulation.crn.paired_comparison). The other run_simulation arguments are given in common.
+    """
+    def run(seed, **params):
+        kwargs = dict(common, **params)
+        return run_simulation(seed=seed, verbose=False, backend='numpy', crn=True, **kwargs)
+
+    return paired_comparison(run, params_a, params_b, replications, seed, list(metrics), confidence)
+
 if __name__ == '__main__':
-    env = simpy.Environment()
-    Channel.reset()
-    nodes = [Node(env, f"Node {i}") for i in range(NUM_NODES)]
-    env.run(until=SIM_TIME)
-    generate_report(nodes)
+    run_simulation()
+
+    # Same model on the vectorized engine
+    run_simulation(backend='numpy')
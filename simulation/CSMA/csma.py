@@ -1,13 +1,22 @@
 from collections import deque
-from scipy.stats import planck, poisson
+import os
+import sys
 import numpy as np
 import simpy
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from simulation.checkpoint import load_checkpoint, save_checkpoint
+from simulation.output_analysis import OutputAnalyzer, confidence_interval
+from simulation.random_streams import RandomStream, spawn_streams
+from simulation.CSMA.frame_registry import FrameRegistry
+
+SEED = None  # Root seed of the per-station random streams
 NUM_STATIONS = 4
-NUM_REPLICATIONS = 1
-TRANSIENT_TIME = 25
+NUM_REPLICATIONS = 8
+TRANSIENT_TIME = 25  # Fixed warm-up, only used when run_replication is not detecting it with MSER-5
 TERMINATE_TIME = 10000
 STEADY_STATE_TIME = TERMINATE_TIME - TRANSIENT_TIME
+ANALYZER_BLOCK = 10  # Completions per block mean of the output analysis
 
 class Arrival:
     def __init__(self, name, time):
@@ -25,13 +34,15 @@ class Frame:
         return f"Frame: start={self.start}, end={self.end}, frame_time={self.frame_time}"
 
 class Station:
-    frames_in_transmit = {}
+    frames_in_transmit = FrameRegistry()
+    last_completion = 0.0  # Time of the last completion handed to the analyzer
 
-    def __init__(self, env, name, exponential_mean, poisson_mean):
+    def __init__(self, env, name, exponential_mean, poisson_mean, stream=None, analyzer=None, transient_time=TRANSIENT_TIME):
         self.env = env
         self.name = name
         self.exponential_mean = exponential_mean
         self.poisson_mean = poisson_mean
+        self.stream = stream if stream is not None else RandomStream()
         self.server = simpy.Resource(self.env, capacity=1)
         self.arrivals = deque()
         self.initial_reset_completed = False
@@ -46,10 +57,14 @@ class Station:
         self.busy_time = 0
         self.steady_state_time = 0
         self.U = 0
+        self.transient_time = transient_time  # The statistical counters restart at the first completion after it
+        # Output analysis shared by the stations: one observation per completion after transient_time of its
+        # transmit time, retries, busy time of the successful transmission and time since the previous completion
+        self.analyzer = analyzer
         self.env.process(self.arrive())
 
     def generate_report(self):
-        self.steady_state_time = self.env.now - TRANSIENT_TIME
+        self.steady_state_time = self.env.now - self.transient_time
         if self.nt > 0:
             self.T = float(self.st) / self.nt
         if self.num_initial_transmits > 0:
@@ -66,9 +81,9 @@ class Station:
 
     def generate_frame_time(self):
         while True:
-            R = planck.rvs(self.exponential_mean, size=1)
-            if R[0] > 0:
-                return R[0]
+            R = self.stream.planck(self.exponential_mean)
+            if R > 0:
+                return R
 
     def create_frame(self, frame_time):
         start = self.env.now
@@ -76,27 +91,28 @@ class Station:
         return Frame(start, end, frame_time)
 
     def add_frame_in_transmit(self, frame, frame_id):
-        Station.frames_in_transmit[frame_id] = frame
+        Station.frames_in_transmit.add(frame_id, frame)
 
     def remove_frame_in_transmit(self, frame_id):
-        return Station.frames_in_transmit.pop(frame_id, None)
+        return Station.frames_in_transmit.remove(frame_id)
 
     def check_collision(self, frame, frame_id):
-        has_collision = False
-        for key, other_frame in Station.frames_in_transmit.items():
-            if key != frame_id and (other_frame.end > frame.start) and (other_frame.start < frame.end):
-                has_collision = True
-                other_frame.retry = True
-        if has_collision:
-            frame.retry = True
+        Station.frames_in_transmit.check_collision(frame, frame_id)
 
     def wait(self):
         mean = 0.0025
-        retry_time = planck.rvs(mean, size=1)[0]
+        retry_time = self.stream.planck(mean)
         yield self.env.timeout(retry_time)
 
+    def record(self, transmit_time, retries, busy):
+        for series, value in (('transmit', transmit_time), ('retries', retries), ('busy', busy),
+                              ('gap', self.env.now - Station.last_completion)):
+            self.analyzer.add(series, [value])
+        Station.last_completion = self.env.now
+
     def transmit(self, name):
         self.num_initial_transmits += 1
+        retries = 0
         success = False
         frame_time = self.generate_frame_time()
 
@@ -111,10 +127,12 @@ class Station:
 
             if frame.retry:
                 self.num_retries += 1
+                retries += 1
                 yield self.env.process(self.wait())
             else:
                 self.busy_time += self.env.now - transmit_time
                 success = True
+        return retries, self.env.now - transmit_time
 
     def wait_for_service(self, name):
         arrival = Arrival(name, self.env.now)
@@ -125,24 +143,27 @@ class Station:
         with self.server.request() as req:
             yield req
             arrival = self.arrivals.popleft()
-            yield self.env.process(self.transmit(name))
+            retries, busy = yield self.env.process(self.transmit(name))
             self.nt += 1
             self.st += self.env.now - arrival.time
             self.n -= 1
+            if self.analyzer is not None and self.env.now >= self.transient_time:
+                self.record(self.env.now - arrival.time, retries, busy)
 
-            if not self.initial_reset_completed and self.env.now >= TRANSIENT_TIME:
+            if not self.initial_reset_completed and self.env.now >= self.transient_time:
                 self.reset_statistical_counters()
                 self.initial_reset_completed = True
 
     def arrive(self):
         i = 0
         while True:
-            inter_t = poisson.rvs(self.poisson_mean, size=1)[0]
+            inter_t = self.stream.poisson(self.poisson_mean)
             yield self.env.timeout(inter_t)
             self.env.process(self.wait_for_service(f'Frame {i}'))
             i += 1
 
-def generate_report_single_replication(mean_transmit_times, mean_num_retries, channel_utilizations, stations):
+def summarize_replication(stations, steady_state_time=STEADY_STATE_TIME):
+    """System-wide means of one replication."""
     total_st, total_nt, total_retries, total_initial_transmits, total_busy_time = 0, 0, 0, 0, 0
 
     for station in stations:
@@ -152,9 +173,39 @@ def generate_report_single_replication(mean_transmit_times, mean_num_retries, ch
         total_initial_transmits += station.num_initial_transmits
         total_busy_time += station.busy_time
 
-    mean_t = float(total_st) / total_nt if total_nt > 0 else 0
-    mean_r = float(total_retries) / total_initial_transmits
-    mean_U = float(total_busy_time) / STEADY_STATE_TIME
+    return {
+        'mean_transmit_time': float(total_st) / total_nt if total_nt > 0 else 0,
+        'mean_retries': float(total_retries) / total_initial_transmits if total_initial_transmits > 0 else 0,
+        'channel_utilization': float(total_busy_time) / steady_state_time,
+    }
+
+def summarize_analyzer(analyzer, end_time, origin=0.0, detect_warmup=True):
+    """
+    System-wide means of one replication from the completions fed to the stations' analyzer. With
+    detect_warmup the completions MSER-5 drops from the transmit times are left out of every mean;
+    otherwise all of them are kept. The mean transmit time and its half-width are batch means;
+    mean retries are per completed frame. Also returns the 'transient_time' where the kept
+    completions start (origin is the time the analyzer started), the 'end_time' and the
+    'transmit_time_half_width'.
+    """
+    warmup = analyzer.estimate('transmit')['warmup'] if detect_warmup else 0
+    estimate = analyzer.estimate('transmit', warmup)
+    kept = estimate['observations'] - warmup
+    start = origin + (analyzer.total('gap') - analyzer.total('gap', warmup))
+    return {
+        'mean_transmit_time': estimate['mean'] if kept > 0 else 0,
+        'mean_retries': analyzer.total('retries', warmup) / kept if kept > 0 else 0,
+        'channel_utilization': analyzer.total('busy', warmup) / (end_time - start) if end_time > start else 0,
+        'transient_time': start,
+        'end_time': end_time,
+        'transmit_time_half_width': estimate['half_width'],
+    }
+
+def generate_report_single_replication(mean_transmit_times, mean_num_retries, channel_utilizations, stations):
+    summary = summarize_replication(stations)
+    mean_t = summary['mean_transmit_time']
+    mean_r = summary['mean_retries']
+    mean_U = summary['channel_utilization']
 
     mean_transmit_times.append(mean_t)
     mean_num_retries.append(mean_r)
@@ -163,31 +214,107 @@ def generate_report_single_replication(mean_transmit_times, mean_num_retries, ch
     print("Report for the whole system (all stations):")
     print(f"Mean transmit time={mean_t}, Mean number retries={mean_r}, Channel utilization={mean_U * 100:.2f}%")
 
-def generate_report_all_replications(mean_transmit_times, mean_num_retries, channel_utilizations):
-    mean_t = np.mean(mean_transmit_times)
-    mean_r = np.mean(mean_num_retries)
-    mean_U = np.mean(channel_utilizations)
+def run_replication(seed=None, num_stations=NUM_STATIONS, exponential_mean=0.25, poisson_mean=10,
+                    terminate_time=TERMINATE_TIME, instrumentation=None, transient_time='mser', rel_precision=None,
+                    check_every=1000):
+    """
+    Run one replication with its own random streams and return its system-wide means.
+    The warm-up is detected with MSER-5 on the transmit times (transient_time='mser') or ends at
+    a fixed transient_time. With rel_precision, terminate_time is only an upper bound: every
+    check_every time units the run stops once the analyzer holds at least 5 num_batches blocks
+    of ANALYZER_BLOCK or more completions and the batch-means confidence interval of the mean
+    transmit time is within rel_precision of the mean.
+    An Instrumentation object records events, collision-check and RNG time of the run.
+    """
+    env = simpy.Environment()
+    Station.frames_in_transmit = FrameRegistry()
+    streams = spawn_streams(seed, num_stations)
+    detect_warmup = transient_time == 'mser'
+    analyzer = OutputAnalyzer(block=ANALYZER_BLOCK) if detect_warmup or rel_precision is not None else None
+    counters_reset = 0 if detect_warmup else transient_time
+    Station.last_completion = float(counters_reset)
+    stations = [Station(env, f'Station {i}', exponential_mean, poisson_mean, streams[i], analyzer, counters_reset)
+                for i in range(num_stations)]
+
+    def run(until):
+        if instrumentation is None:
+            env.run(until=until)
+        else:
+            instrumentation.run(env, until, hot=[(Station, 'check_collision'), (RandomStream, 'next')])
+
+    if analyzer is None:
+        run(terminate_time)
+        return summarize_replication(stations, terminate_time - transient_time)
+
+    end = 0
+    while end < terminate_time:
+        end = min(end + check_every, terminate_time) if rel_precision is not None else terminate_time
+        run(end)
+        if rel_precision is not None and analyzer.converged(rel_precision, ['transmit'], warmup=None if detect_warmup else 0):
+            break
+    return summarize_analyzer(analyzer, end, counters_reset, detect_warmup)
+
+def run_replications(num_replications=NUM_REPLICATIONS, seed=SEED, processes=None, confidence=0.95, checkpoint=None,
+                     **params):
+    """
+    Run independent replications on a process pool (one SeedSequence child per replication) and
+    aggregate them. Returns {'replications': [...], metric: {'mean', 'half_width', 'ci'}} for
+    the mean transmit time, mean retries and channel utilization; params go to run_replication.
+    With checkpoint, finished replications (and the root seed entropy) are saved to that file as
+    they complete; rerunning with the same arguments only runs the missing ones.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from functools import partial
+
+    state = load_checkpoint(checkpoint)
+    if state is None:
+        state = {'entropy': np.random.SeedSequence(seed).entropy, 'num_replications': num_replications,
+                 'params': params, 'done': {}}
+    elif (state['num_replications'], state['params']) != (num_replications, params):
+        raise ValueError("Checkpoint was written for different replications or parameters")
+    seeds = np.random.SeedSequence(state['entropy']).spawn(num_replications)
+    pending = [r for r in range(num_replications) if r not in state['done']]
+
+    def finished(r, result):
+        state['done'][r] = result
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, state)
+
+    if processes == 1:
+        for r in pending:
+            finished(r, run_replication(seeds[r], **params))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(partial(run_replication, **params), seeds[r]): r for r in pending}
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+    replications = [state['done'][r] for r in range(num_replications)]
+
+    results = {'replications': replications, 'confidence': confidence}
+    for metric in ('mean_transmit_time', 'mean_retries', 'channel_utilization'):
+        mean, half_width = confidence_interval([r[metric] for r in replications], confidence)
+        results[metric] = {'mean': mean, 'half_width': half_width, 'ci': (mean - half_width, mean + half_width)}
+    return results
+
+def generate_report_all_replications(mean_transmit_times, mean_num_retries, channel_utilizations, confidence=0.95):
+    mean_t, hw_t = confidence_interval(mean_transmit_times, confidence)
+    mean_r, hw_r = confidence_interval(mean_num_retries, confidence)
+    mean_U, hw_U = confidence_interval(channel_utilizations, confidence)
 
     print("-----------------------")
-    print("Report over all replications: (means are over all replications)")
-    print(f"Mean transmit time={mean_t}, Mean number retries={mean_r}, Channel utilization={mean_U * 100:.2f}%")
+    print(f"Report over all replications: (means are over all replications, +/- {confidence * 100:.0f}% CI half-width)")
+    print(f"Mean transmit time={mean_t} +/- {hw_t}, Mean number retries={mean_r} +/- {hw_r}, "
+          f"Channel utilization={mean_U * 100:.2f}% +/- {hw_U * 100:.2f}%")
 
 if __name__ == '__main__':
-    mean_transmit_times = []
-    mean_num_retries = []
-    channel_utilizations = []
+    results = run_replications(NUM_REPLICATIONS, seed=SEED)
 
-    for r in range(NUM_REPLICATIONS):
+    for r, replication in enumerate(results['replications']):
         print("-----------------------")
         print(f"Replication {r + 1}")
-        env = simpy.Environment()
-        exponential_mean = 0.25
-        poisson_mean = 10
-        stations = [Station(env, f'Station {i}', exponential_mean, poisson_mean) for i in range(NUM_STATIONS)]
-        env.run(until=TERMINATE_TIME)
-        print("Report for each Station:")
-        for station in stations:
-            station.generate_report()
-        generate_report_single_replication(mean_transmit_times, mean_num_retries, channel_utilizations, stations)
-
-    #generate_report_all_replications(mean_transmit_times, mean_num_retries, channel_utilizations)
\ No newline at end of file
+        print(f"Mean transmit time={replication['mean_transmit_time']}, Mean number retries={replication['mean_retries']}, "
+              f"Channel utilization={replication['channel_utilization'] * 100:.2f}%")
+
+    generate_report_all_replications([r['mean_transmit_time'] for r in results['replications']],
+                                     [r['mean_retries'] for r in results['replications']],
+                                     [r['channel_utilization'] for r in results['replications']])
@@ -0,0 +1,56 @@
+from bisect import bisect_left, insort
+from itertools import count
+
+
+class FrameRegistry:
+    """
+    In-flight frame registry indexed by start time.
+    Frames are added when they start and removed when they end, so the registered frames are
+    exactly the ones in flight and every removed frame ended at or before the current time. When a
+    frame F ends, it overlapped another frame G iff
+      - G is still registered and started before F ended (G.start < F.end), or
+      - G was removed earlier and ended after F started (G.end > F.start).
+    The first check is a bisection on the sorted start times and the second only needs the latest
+    end time of the removed frames, so check_collision costs O(log n) instead of a scan over all
+    frames in flight. Frames that F overlaps are flagged lazily: each of them sees F through the
+    same test when it ends, which yields the same retry flags as flagging them eagerly.
+    The registry therefore never lists which frames overlap an interval; it only decides, when a
+    frame ends, whether that frame collided.
+    """
+    def __init__(self):
+        self.frames = {}  # frame_id -> frame
+        self.entries = []  # Sorted (start, seq, frame_id) of the registered frames
+        self.keys = {}  # frame_id -> its entry
+        self.last_end = float('-inf')  # Latest end time of a removed frame
+        self.seq = count()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, frame_id):
+        return frame_id in self.frames
+
+    def add(self, frame_id, frame):
+        entry = (frame.start, next(self.seq), frame_id)
+        self.frames[frame_id] = frame
+        self.keys[frame_id] = entry
+        insort(self.entries, entry)
+
+    def remove(self, frame_id):
+        frame = self.frames.pop(frame_id, None)
+        if frame is None:
+            return None
+        entry = self.keys.pop(frame_id)
+        del self.entries[bisect_left(self.entries, entry)]
+        self.last_end = max(self.last_end, frame.end)
+        return frame
+
+    def check_collision(self, frame, frame_id):
+        """Flag `frame` for retry if any other frame overlapped it. Call when the frame ends, before removing it."""
+        started_before_end = bisect_left(self.entries, (frame.end,))
+        if frame_id in self.frames and self.keys[frame_id][0] < frame.end:
+            started_before_end -= 1
+        if started_before_end > 0 or self.last_end > frame.start:
+            frame.retry = True
+        return frame.retry
+
@@ -0,0 +1,38 @@
+import os
+import pickle
+
+
+def save_checkpoint(path, state):
+    """Pickle state to path atomically: a preempted save leaves the previous checkpoint intact."""
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """The state saved at path, or None if there is no checkpoint yet."""
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def run_checkpointed(engine, position, advance, target, path, every, done=None):
+    """
+    Drive a vectorized engine to `target` in steps of `every`, saving engine.get_state() to path
+    (if not None) after each step. If path already holds a checkpoint the engine resumes from it,
+    so a run that is killed and restarted with the same arguments ends in the same state as an
+    uninterrupted one. position(engine) gives the progress so far, advance(engine, stop) runs up
+    to `stop`; the optional done(engine) ends the run early (e.g. once the estimates are precise).
+    """
+    state = load_checkpoint(path)
+    if state is not None:
+        engine.set_state(state)
+    while position(engine) < target and not (done is not None and done(engine)):
+        advance(engine, min(position(engine) + every, target))
+        if path is not None:
+            save_checkpoint(path, engine.get_state())
+    return engine
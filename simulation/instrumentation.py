@@ -0,0 +1,120 @@
+import cProfile
+import inspect
+import time
+from collections import Counter
+
+
+class Instrumentation:
+    """
+    Opt-in instrumentation of a SimPy run. The simulators call env.run directly unless they are
+    given an Instrumentation, so a disabled run pays nothing. When enabled, run() wraps the
+    environment and the hot functions for the duration of the run only, and records:
+    - scheduled events by type (Timeout, Initialize, Request, ...),
+    - calls and wall time of each hot function (e.g. check_collision, attempt_transmission),
+    - simulated time per wall-clock second,
+    - event-queue length sampled every `sample_every` processed events,
+    - optionally a cProfile of the whole run, written to `profile` (read it with pstats/snakeviz).
+    """
+    def __init__(self, sample_every=1000, profile=None):
+        self.sample_every = sample_every
+        self.profile = profile
+        self.events = Counter()
+        self.calls = Counter()
+        self.time_in = Counter()
+        self.queue_samples = []  # (simulated time, events in the queue)
+        self.steps = 0
+        self.wall = 0.0
+        self.sim_time = 0.0
+
+    def timed(self, name, function):
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.time_in[name] += time.perf_counter() - t0
+                self.calls[name] += 1
+        return wrapper
+
+    def patch(self, owner, attribute):
+        """Replace owner.attribute by a timed wrapper; returns the original for restore()."""
+        original = inspect.getattr_static(owner, attribute)
+        name = f'{owner.__name__}.{attribute}'
+        if isinstance(original, staticmethod):
+            setattr(owner, attribute, staticmethod(self.timed(name, original.__func__)))
+        elif isinstance(original, classmethod):
+            setattr(owner, attribute, classmethod(self.timed(name, original.__func__)))
+        else:
+            setattr(owner, attribute, self.timed(name, original))
+        return owner, attribute, original
+
+    def attach(self, env):
+        """Count scheduled events and sample the queue through instance attributes of env."""
+        schedule = env.schedule
+        step = env.step
+
+        def counted_schedule(event, *args, **kwargs):
+            self.events[type(event).__name__] += 1
+            schedule(event, *args, **kwargs)
+
+        def sampled_step():
+            if self.steps % self.sample_every == 0:
+                self.queue_samples.append((env.now, len(env._queue)))
+            self.steps += 1
+            step()
+
+        env.schedule = counted_schedule
+        env.step = sampled_step
+
+    def run(self, env, until=None, hot=()):
+        """
+        env.run(until) with instrumentation; hot lists the (class, method name) pairs to time,
+        which are restored afterwards.
+        """
+        self.attach(env)
+        patched = [self.patch(owner, attribute) for owner, attribute in hot]
+        profiler = cProfile.Profile() if self.profile else None
+        start = env.now
+        t0 = time.perf_counter()
+        try:
+            if profiler:
+                profiler.enable()
+            env.run(until=until)
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(self.profile)
+            self.wall += time.perf_counter() - t0
+            self.sim_time += env.now - start
+            for owner, attribute, original in patched:
+                setattr(owner, attribute, original)
+            del env.schedule, env.step
+
+    def summary(self):
+        queue = [length for _, length in self.queue_samples]
+        return {
+            'wall': self.wall,
+            'sim_time': self.sim_time,
+            'sim_time_per_wall_second': self.sim_time / self.wall if self.wall > 0 else float('nan'),
+            'events': dict(self.events),
+            'events_per_wall_second': sum(self.events.values()) / self.wall if self.wall > 0 else float('nan'),
+            'calls': dict(self.calls),
+            'time_in': dict(self.time_in),
+            'queue_mean': sum(queue) / len(queue) if queue else 0,
+            'queue_max': max(queue, default=0),
+            'queue_samples': self.queue_samples,
+        }
+
+    def report(self):
+        summary = self.summary()
+        print(f"Wall time: {summary['wall']:.3f} s, simulated time: {summary['sim_time']:.1f} "
+              f"({summary['sim_time_per_wall_second']:.1f} per wall second)")
+        print(f"Scheduled events: {sum(self.events.values())} ({summary['events_per_wall_second']:.0f}/s)")
+        for name, count in self.events.most_common():
+            print(f"  {name:<20} {count:>10}")
+        for name in self.calls:
+            share = self.time_in[name] / self.wall * 100 if self.wall > 0 else 0
+            print(f"  {name:<40} {self.calls[name]:>10} calls {self.time_in[name]:>8.3f} s ({share:.1f}% of wall)")
+        print(f"Event queue length: mean {summary['queue_mean']:.1f}, max {summary['queue_max']}")
+        if self.profile:
+            print(f"Profile written to {self.profile}")
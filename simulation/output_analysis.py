@@ -0,0 +1,163 @@
+import copy
+
+import numpy as np
+
+
+def confidence_interval(values, confidence=0.95):
+    """Student-t confidence interval of the mean: (mean, half_width)."""
+    from scipy.stats import t  # Only needed once the observations are in
+
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    mean = float(values.mean())
+    if n < 2:
+        return mean, float('inf')
+    half_width = t.ppf((1 + confidence) / 2, n - 1) * values.std(ddof=1) / np.sqrt(n)
+    return mean, float(half_width)
+
+
+def mser5(x):
+    """
+    MSER-5 warm-up truncation: the series is averaged over batches of 5 and the number d of
+    leading batches is chosen to minimize the squared standard error of the remaining mean,
+        MSER(d) = sum_{i >= d} (Y_i - mean(Y_d..))^2 / (m - d)^2,
+    searching the first half only. Returns the number of observations to drop (5 d).
+    """
+    x = np.asarray(x, dtype=float)
+    m = len(x) // 5
+    if m < 2:
+        return 0
+    y = x[:5 * m].reshape(m, 5).mean(axis=1)
+    y = y - y.mean()  # Centre before the running sums to limit cancellation
+    count = np.arange(m, 0, -1)
+    tail_sum = np.cumsum(y[::-1])[::-1]
+    tail_squares = np.cumsum((y ** 2)[::-1])[::-1]
+    mser = (tail_squares - tail_sum ** 2 / count) / count ** 2
+    return 5 * int(np.argmin(mser[:max(1, m // 2)]))
+
+
+def batch_means(x, num_batches=20, confidence=0.95):
+    """
+    Mean and confidence half-width from num_batches non-overlapping batch means; the oldest
+    observations that do not fill a batch are dropped. Returns (mean, half_width).
+    """
+    x = np.asarray(x, dtype=float)
+    size = len(x) // num_batches
+    if size == 0:
+        return (float(x.mean()) if len(x) else float('nan')), float('inf')
+    batches = x[len(x) - size * num_batches:].reshape(num_batches, size).mean(axis=1)
+    return confidence_interval(batches, confidence)
+
+
+class OutputAnalyzer:
+    """
+    Online output analysis of one or more series (e.g. per-slot successes, AoI or per-message
+    delay). Each series is reduced to means of `block` consecutive observations; once a series
+    has more than max_blocks of them, neighbouring blocks are merged and its block size doubles,
+    so memory stays bounded on long runs. estimate() truncates the warm-up with MSER-5 on the
+    block means and puts a batch-means confidence interval on the rest.
+    """
+    def __init__(self, block=100, max_blocks=4096, num_batches=20, confidence=0.95):
+        self.initial_block = block
+        self.max_blocks = max_blocks
+        self.num_batches = num_batches
+        self.confidence = confidence
+        self.series = {}  # name -> {'block', 'means', 'partial_sum', 'partial_count', 'observations'}
+
+    def add(self, name, values):
+        """Append consecutive observations of series `name`."""
+        values = np.asarray(values, dtype=float).ravel()
+        s = self.series.get(name)
+        if s is None:
+            s = self.series[name] = {'block': self.initial_block, 'means': np.empty(0), 'partial_sum': 0.0,
+                                     'partial_count': 0, 'observations': 0}
+        s['observations'] += len(values)
+        block = s['block']
+
+        # Complete the open block, then whole blocks at once, then keep the tail open
+        head = min(block - s['partial_count'], len(values))
+        s['partial_sum'] += float(values[:head].sum())
+        s['partial_count'] += head
+        new = []
+        if s['partial_count'] == block:
+            new.append(s['partial_sum'] / block)
+            s['partial_sum'], s['partial_count'] = 0.0, 0
+        rest = values[head:]
+        full = len(rest) // block
+        if full:
+            new.extend(rest[:full * block].reshape(full, block).mean(axis=1))
+        tail = rest[full * block:]
+        if len(tail):
+            s['partial_sum'] += float(tail.sum())
+            s['partial_count'] += len(tail)
+        if new:
+            s['means'] = np.concatenate((s['means'], new))
+
+        while len(s['means']) > self.max_blocks:
+            means = s['means']
+            if len(means) % 2:
+                # The odd block out goes back into the open one, which now spans two blocks
+                s['partial_sum'] += means[-1] * s['block']
+                s['partial_count'] += s['block']
+                means = means[:-1]
+            s['means'] = (means[0::2] + means[1::2]) / 2
+            s['block'] *= 2
+
+    def estimate(self, name, warmup=None):
+        """
+        {'mean', 'half_width', 'relative_half_width', 'warmup' (observations dropped), 'observations'}.
+        A given warmup (in observations, rounded down to whole blocks) replaces the MSER-5 choice.
+        """
+        s = self.series.get(name)
+        if s is None or len(s['means']) == 0:
+            return {'mean': float('nan'), 'half_width': float('inf'), 'relative_half_width': float('inf'),
+                    'warmup': 0, 'observations': 0 if s is None else s['observations']}
+        d = mser5(s['means']) if warmup is None else min(warmup // s['block'], len(s['means']))
+        mean, half_width = batch_means(s['means'][d:], self.num_batches, self.confidence)
+        return {
+            'mean': mean,
+            'half_width': half_width,
+            'relative_half_width': half_width / abs(mean) if mean != 0 else float('inf'),
+            'warmup': d * s['block'],
+            'observations': s['observations'],
+        }
+
+    def total(self, name, warmup=0):
+        """Sum of the observations of series `name` after the first warmup (a whole number of blocks)."""
+        s = self.series.get(name)
+        if s is None:
+            return 0.0
+        return float(s['means'][warmup // s['block']:].sum() * s['block'] + s['partial_sum'])
+
+    def converged(self, rel_precision, names=None, min_blocks=None, warmup=None):
+        """
+        True once every series (or those in names) has at least min_blocks blocks (default
+        5 num_batches) and a relative half-width <= rel_precision; warmup goes to estimate().
+        """
+        min_blocks = min_blocks or 5 * self.num_batches
+        names = list(self.series) if names is None else names
+        if not names:
+            return False
+        for name in names:
+            s = self.series.get(name)
+            if s is None or len(s['means']) < min_blocks:
+                return False
+            if self.estimate(name, warmup)['relative_half_width'] > rel_precision:
+                return False
+        return True
+
+    def results(self):
+        """Estimates of all series, flattened to {name_steady, name_half_width, name_warmup}."""
+        results = {}
+        for name in self.series:
+            estimate = self.estimate(name)
+            results[f'{name}_steady'] = estimate['mean']
+            results[f'{name}_half_width'] = estimate['half_width']
+            results[f'{name}_warmup'] = estimate['warmup']
+        return results
+
+    def get_state(self):
+        return copy.deepcopy(self.__dict__)
+
+    def set_state(self, state):
+        self.__dict__.update(copy.deepcopy(state))
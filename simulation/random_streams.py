@@ -0,0 +1,49 @@
+import numpy as np
+
+BLOCK_SIZE = 4096  # Variates drawn per refill of a buffer
+
+
+class RandomStream:
+    """
+    Buffered source of random variates for one station/node.
+    Each distribution (with its parameters) gets its own buffer, refilled with a block drawn from a
+    numpy Generator, and scalars are handed out from the block. The values follow exactly the
+    distribution of the corresponding one-at-a-time calls.
+    """
+    def __init__(self, seed=None, block=BLOCK_SIZE):
+        self.rng = np.random.default_rng(seed)
+        self.block = block
+        self.buffers = {}  # (distribution, parameters) -> [values, position]
+
+    def next(self, key, draw):
+        buffer = self.buffers.get(key)
+        if buffer is None or buffer[1] == len(buffer[0]):
+            buffer = self.buffers[key] = [draw(self.block).tolist(), 0]
+        value = buffer[0][buffer[1]]
+        buffer[1] += 1
+        return value
+
+    def random(self):
+        """Uniform on [0, 1)."""
+        return self.next(('random',), self.rng.random)
+
+    def exponential(self, scale):
+        return self.next(('exponential', scale), lambda n: self.rng.exponential(scale, n))
+
+    def integers(self, low, high):
+        """Integer uniform on [low, high), like np.random.randint."""
+        return self.next(('integers', low, high), lambda n: self.rng.integers(low, high, n))
+
+    def poisson(self, lam):
+        return self.next(('poisson', lam), lambda n: self.rng.poisson(lam, n))
+
+    def planck(self, lambda_):
+        """Same distribution as scipy.stats.planck(lambda_): P(k) = (1 - e^-lambda) e^(-lambda k), k >= 0."""
+        p = -np.expm1(-lambda_)
+        return self.next(('planck', lambda_), lambda n: self.rng.geometric(p, n) - 1)
+
+
+def spawn_streams(seed, n, block=BLOCK_SIZE):
+    """n independent, reproducible streams derived from one seed (an int, sequence of ints or SeedSequence)."""
+    sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return [RandomStream(child, block) for child in sequence.spawn(n)]
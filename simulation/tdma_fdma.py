@@ -0,0 +1,141 @@
+"""
+Vectorized queue simulators for TDMA and FDMA, to check the analytic delay models in theory/.
+
+Time is in slots. Each of the M users receives Poisson messages of L packets at rate
+P / (L M) per slot, so P is the utilization of its share of the channel, and users do not
+interact, so a run simulates `users` independent copies of one user's queue.
+- FDMA: the user owns 1/M of the bandwidth; a message is served continuously in L M slots.
+- TDMA: the user owns one slot per frame of M slots; a message is sent one packet per frame,
+  starting at the first own slot after it reaches the head of the queue.
+Both are Lindley recursions s_n = max(g(a_n), s_{n-1} + L M) for the service start s_n, with
+g(a) = a (FDMA) or g(a) = next own slot (TDMA); unrolled,
+    s_n = n L M + max_{j <= n} (g(a_j) - j L M),
+a running maximum that NumPy evaluates over whole arrays of arrivals.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from simulation.output_analysis import confidence_interval
+
+# Upper bound on the number of packets per user and chunk held in memory at once
+CHUNK_ELEMENTS = 1 << 22
+
+
+def service_start(g, step, carry, first_index):
+    """
+    Lindley recursion on one chunk: service starts for ready times g of consecutive messages
+    numbered from first_index, given the running maximum `carry` of the previous chunks (one
+    value per user, None before the first). Returns (starts, new carry).
+    """
+    n = first_index + np.arange(g.shape[1])
+    shifted = g - n * step
+    if carry is not None:
+        shifted[:, 0] = np.maximum(shifted[:, 0], carry)
+    running = np.maximum.accumulate(shifted, axis=1)
+    return n * step + running, running[:, -1]
+
+
+def spawn(seed, n):
+    """n independent seeds from an int, None or SeedSequence."""
+    sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return sequence.spawn(n)
+
+
+def simulate_delays(scheme, M, P, L=1, messages=10 ** 6, users=10, seed=None, warmup=0.1):
+    """
+    Mean message delay (arrival to the end of its last packet) of each of `users` independent
+    queues, each fed messages // users messages; the first `warmup` fraction of each queue's
+    messages is discarded. Returns an array with one mean per user.
+    """
+    if scheme not in ('tdma', 'fdma'):
+        raise ValueError(f"Unknown scheme: {scheme}")
+    if P >= 1:
+        return np.full(users, np.inf)
+    rng = np.random.default_rng(seed)
+    per_user = messages // users
+    skip = int(warmup * per_user)
+    step = L * M
+    chunk = max(1, CHUNK_ELEMENTS // users)
+
+    total = np.zeros(users)
+    last_arrival = np.zeros(users)
+    carry = None
+    for first in range(0, per_user, chunk):
+        n = min(chunk, per_user - first)
+        a = last_arrival[:, None] + np.cumsum(rng.exponential(step / P, (users, n)), axis=1)
+        last_arrival = a[:, -1]
+        if scheme == 'fdma':
+            start, carry = service_start(a, step, carry, first)
+            delay = start + step - a
+        else:
+            own_slot = M * np.ceil(a / M)  # Own slots start at multiples of M (any fixed offset is equivalent)
+            start, carry = service_start(own_slot, step, carry, first)
+            delay = start + (L - 1) * M + 1 - a
+        keep = max(0, skip - first)
+        total += delay[:, keep:].sum(axis=1)
+    return total / (per_user - skip)
+
+
+def simulate_delay(scheme, M, P, L=1, messages=10 ** 6, users=10, seed=None, warmup=0.1, confidence=0.95):
+    """Mean delay over the users with its confidence half-width: (mean, half_width)."""
+    means = simulate_delays(scheme, M, P, L, messages, users, seed, warmup)
+    if not np.all(np.isfinite(means)):
+        return float('inf'), float('nan')
+    return confidence_interval(means, confidence)
+
+
+def delay_curve(scheme, M, P_values, L=1, messages=10 ** 6, users=10, seed=None):
+    """simulate_delay over P_values (independent seeds). Returns (means, half_widths) arrays."""
+    seeds = spawn(seed, len(P_values))
+    results = [simulate_delay(scheme, M, P, L, messages, users, s) for P, s in zip(P_values, seeds)]
+    return np.array([m for m, _ in results]), np.array([h for _, h in results])
+
+
+def overlay(spec, scheme, M_values, P_values=None, L=1, messages=10 ** 6, users=10, seed=None, vs='P', P=None):
+    """
+    Add simulated points with confidence bars to a delay_vs_P_data (vs='P', one curve per M in
+    M_values) or delay_vs_M_data (vs='M', at utilization P) figure spec of the theory models.
+    """
+    spec = dict(spec, series=list(spec['series']))
+    seeds = spawn(seed, len(M_values))
+    if vs == 'P':
+        for M, s in zip(M_values, seeds):
+            means, half_widths = delay_curve(scheme, M, P_values, L, messages, users, s)
+            spec['series'].append({'x': P_values, 'y': means, 'yerr': half_widths, 'label': f'M={M} (simulated)'})
+    else:
+        results = [simulate_delay(scheme, M, P, L, messages, users, s) for M, s in zip(M_values, seeds)]
+        spec['series'].append({'x': M_values, 'y': [m for m, _ in results], 'yerr': [h for _, h in results],
+                               'label': f'P={P:.2f} (simulated)'})
+    return spec
+
+
+def validated_delay_vs_P_data(scheme='tdma', P_values=(0.1, 0.3, 0.5, 0.7, 0.8, 0.9), M_values=(5, 10, 100, 1000),
+                              messages=10 ** 6, users=10, seed=0):
+    """Analytic delay_vs_P figure of the simplified model with simulated points overlaid."""
+    from loader import load_script
+
+    if scheme == 'tdma':
+        model = load_script('theory/TDMA/simplified_tdma.py').Simplified_TDMA()
+    else:
+        model = load_script('theory/FDMA/simplified_fdma.py').Simplified_FDMA()
+    return overlay(model.delay_vs_P_data(), scheme, M_values, np.asarray(P_values), 1, messages, users, seed)
+
+
+if __name__ == '__main__':
+    from loader import load_script
+
+    tdma = load_script('theory/TDMA/simplified_tdma.py').Simplified_TDMA()
+    fdma = load_script('theory/FDMA/simplified_fdma.py').Simplified_FDMA()
+    print(f"{'scheme':>6} {'M':>5} {'P':>5} {'simulated':>12} {'+/-':>8} {'formula':>12}")
+    for scheme, model in (('tdma', tdma), ('fdma', fdma)):
+        for M in (5, 100, 1000):
+            for P in (0.3, 0.7, 0.9):
+                mean, half_width = simulate_delay(scheme, M, P, seed=1)
+                print(f"{scheme:>6} {M:>5} {P:>5} {mean:>12.3f} {half_width:>8.3f} {float(model.calculate_delay(M, P)):>12.3f}")
+
+    from plotting import show_figure
+
+    show_figure(validated_delay_vs_P_data('tdma'))
@@ -1,8 +1,13 @@
 from collections import deque
 from scipy.stats import planck, poisson
+import os
+import sys
 import numpy as np
 import simpy
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from simulation.CSMA.frame_registry import FrameRegistry
+
 NUM_STATIONS = 1
 NUM_REPLICATIONS = 1
 TRANSIENT_TIME = 25
@@ -25,7 +30,7 @@ class Frame:
         return f"Frame: start={self.start}, end={self.end}, frame_time={self.frame_time}"
 
 class Station:
-    frames_in_transmit = {}
+    frames_in_transmit = FrameRegistry()
 
     def __init__(self, env, name, exponential_mean, poisson_mean):
         self.env = env
@@ -84,19 +89,13 @@ class Station:
         return Frame(start, end, frame_time)
 
     def add_frame_in_transmit(self, frame, frame_id):
-        Station.frames_in_transmit[frame_id] = frame
+        Station.frames_in_transmit.add(frame_id, frame)
 
     def remove_frame_in_transmit(self, frame_id):
-        return Station.frames_in_transmit.pop(frame_id, None)
+        return Station.frames_in_transmit.remove(frame_id)
 
     def check_collision(self, frame, frame_id):
-        has_collision = False
-        for key, other_frame in Station.frames_in_transmit.items():
-            if key != frame_id and (other_frame.end > frame.start) and (other_frame.start < frame.end):
-                has_collision = True
-                other_frame.retry = True
-        if has_collision:
-            frame.retry = True
+        Station.frames_in_transmit.check_collision(frame, frame_id)
 
     def wait(self):
         mean = 0.0025
@@ -179,6 +178,7 @@ if __name__ == '__main__':
         print("-----------------------")
         print(f"Replication {r + 1}")
         env = simpy.Environment()
+        Station.frames_in_transmit = FrameRegistry()
         exponential_mean = 0.25
         poisson_mean = 10
         stations = [Station(env, f'Station {i}', exponential_mean, poisson_mean) for i in range(NUM_STATIONS)]
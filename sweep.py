@@ -0,0 +1,116 @@
+import argparse
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from loader import load_script
+
+# Script implementing each model and how a grid point (N, P, sim_time) maps onto its run_simulation
+MODELS = {
+    'aloha': (
+        'simulation/ALOHA/slotted_aloha_no-re-xmit.py',
+        lambda N, P, sim_time: dict(N=N, P=P, MaxSimtime=sim_time, trace_every=None),
+    ),
+    'aloha-rexmit': (
+        'simulation/ALOHA/slotted_aloha_re-xmit.py',
+        lambda N, P, sim_time: dict(num_nodes=N, lam=P, sim_time=sim_time),
+    ),
+    'test2': (
+        'test2.py',
+        lambda N, P, sim_time: dict(N=N, P=P, MaxSimtime=sim_time),
+    ),
+}
+
+
+def task_seeds(seed, n):
+    """Derive n independent integer seeds from one root seed."""
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(n)]
+
+
+def run_task(task):
+    model, N, P, replication, sim_time, seed, options = task
+    script, params = MODELS[model]
+    module = load_script(script)
+    results = module.run_simulation(**params(N, P, sim_time), seed=seed, verbose=False, **options)
+    row = {'model': model, 'N': N, 'P': P, 'replication': replication, 'sim_time': sim_time, 'seed': seed}
+    row.update((key, value) for key, value in results.items() if key not in row)
+    return row
+
+
+def sweep(model, N_values, P_values, replications=1, sim_time=10000.0, seed=None, processes=None, **options):
+    """
+    Run every (N, P) grid point `replications` times on a process pool.
+    For 'aloha-rexmit' P is the arrival rate lambda. Extra keyword options (e.g. backend='numpy')
+    are passed to the model's run_simulation. Returns one dict per run, in grid order.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model: {model} (choose from {', '.join(MODELS)})")
+
+    grid = list(itertools.product(N_values, P_values, range(replications)))
+    seeds = task_seeds(seed, len(grid))
+    tasks = [(model, N, P, r, sim_time, s, options) for (N, P, r), s in zip(grid, seeds)]
+
+    if processes == 1:
+        return [run_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(run_task, tasks, chunksize=max(1, len(tasks) // (4 * (processes or os.cpu_count())))))
+
+
+def missing_writer(path):
+    """Packages missing to write `path`: Parquet needs pandas and pyarrow (or fastparquet)."""
+    from importlib.util import find_spec
+
+    if not path.endswith('.parquet'):
+        return []
+    missing = [] if find_spec('pandas') else ['pandas']
+    if not (find_spec('pyarrow') or find_spec('fastparquet')):
+        missing.append('pyarrow')
+    return missing
+
+
+def write_results(rows, path):
+    """Write sweep rows to a CSV file, or to Parquet if the path ends in .parquet (needs pandas)."""
+    if path.endswith('.parquet'):
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError("Writing Parquet requires pandas and pyarrow") from e
+        pd.DataFrame(rows).to_parquet(path, index=False)
+        return
+
+    fields = list(dict.fromkeys(key for row in rows for key in row))
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parallel (N, P) parameter sweep for the ALOHA simulators.')
+    parser.add_argument('model', choices=sorted(MODELS))
+    parser.add_argument('--N', type=int, nargs='+', required=True, help='number of nodes')
+    parser.add_argument('--P', type=float, nargs='+', required=True,
+                        help='transmission probability (arrival rate for aloha-rexmit)')
+    parser.add_argument('--replications', type=int, default=1)
+    parser.add_argument('--time', type=float, default=10000.0, help='simulated time per run')
+    parser.add_argument('--seed', type=int, default=None, help='root seed for all runs')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--backend', default=None, help="run_simulation backend, e.g. 'numpy' for aloha")
+    parser.add_argument('--out', default='sweep.csv', help='output table (.csv or .parquet)')
+    args = parser.parse_args(argv)
+    missing = missing_writer(args.out)
+    if missing:
+        # Fail before the grid runs rather than after, when the results would be lost
+        parser.error(f"writing {args.out} requires {' and '.join(missing)}; install them or write a .csv")
+
+    options = {'backend': args.backend} if args.backend else {}
+    rows = sweep(args.model, args.N, args.P, args.replications, args.time, args.seed, args.processes, **options)
+    write_results(rows, args.out)
+    print(f"Wrote {len(rows)} runs to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
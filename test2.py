@@ -1,7 +1,9 @@
 import random
-import simpy
+
+import numpy as np
 
 TIME_GEN = 0
+AGGREGATE_CHUNK = 1 << 20  # Slots drawn at once by the aggregate backend
 
 class Node:
     NextID = 0  # ID of next Node object to be created
@@ -33,23 +35,69 @@ class Node:
             if self.MyID == 0:  # Only the first node clears the list
                 Node.TransmittingNodes = []
 
-def run_simulation(N=20, P=0.2, MaxSimtime=10000.0):
+def run_aggregate(N, P, num_slots, rng, record_winners=False):
+    """
+    Population-level run: the number of transmitters of each slot is drawn as Binomial(N, P), so
+    the cost does not depend on N. A slot with exactly one transmitter is a success; with
+    record_winners the transmitter's id, uniform over the N nodes, is drawn for those slots only.
+    Returns (messages generated, messages sent, winner ids or None).
+    """
+    generated = sent = 0
+    winners = [] if record_winners else None
+    for start in range(0, num_slots, AGGREGATE_CHUNK):
+        counts = rng.binomial(N, P, min(AGGREGATE_CHUNK, num_slots - start))
+        generated += int(counts.sum())
+        successes = int(np.count_nonzero(counts == 1))
+        sent += successes
+        if record_winners:
+            winners.append(rng.integers(0, N, successes))
+    return generated, sent, (np.concatenate(winners) if winners else None)
+
+def run_simulation(N=20, P=0.2, MaxSimtime=10000.0, seed=None, verbose=True, backend='simpy', record_winners=False):
+    """
+    backend='simpy' runs one process per node; backend='aggregate' draws only the number of
+    transmitters of each of the slots t = 1, 2, ... < MaxSimtime (see run_aggregate), at a cost
+    independent of N. With record_winners the ids of the successful nodes are left in Node.Winners.
+    """
     # Reset class variables
     Node.NextID = 0
     Node.MsgsSent = 0
     Node.MsgsGenerated = 0
     Node.TransmittingNodes = []
+    Node.Winners = None
+
+    if backend == 'aggregate':
+        Node.MsgsGenerated, Node.MsgsSent, Node.Winners = run_aggregate(
+            N, P, int(np.ceil(MaxSimtime)) - 1, np.random.default_rng(seed), record_winners)
+    elif backend == 'simpy':
+        import simpy  # Only the event-driven backend needs SimPy
 
-    # Create simulation environment
-    env = simpy.Environment()
+        if seed is not None:
+            random.seed(seed)
 
-    # Create and activate nodes
-    nodes = [Node(env, P) for _ in range(N)]
-    for node in nodes:
-        env.process(node.run())
+        # Create simulation environment
+        env = simpy.Environment()
 
-    # Run simulation
-    env.run(until=MaxSimtime)
+        # Create and activate nodes
+        nodes = [Node(env, P) for _ in range(N)]
+        for node in nodes:
+            env.process(node.run())
+
+        # Run simulation
+        env.run(until=MaxSimtime)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    results = {
+        'N': N,
+        'P': P,
+        'msgs_generated': Node.MsgsGenerated,
+        'msgs_sent': Node.MsgsSent,
+        'throughput': Node.MsgsSent / MaxSimtime,
+        'success_rate': Node.MsgsSent / Node.MsgsGenerated if Node.MsgsGenerated > 0 else 0,
+    }
+    if not verbose:
+        return results
 
     # Print results
     print(f"\nSimulation Results:")
@@ -59,8 +107,12 @@ def run_simulation(N=20, P=0.2, MaxSimtime=10000.0):
     print(f"  Total Msgs Sent: {Node.MsgsSent}")
     print(f"  Mean Throughput: {Node.MsgsSent / MaxSimtime:.4f}")
     print(f"  Message Success Rate: {Node.MsgsSent / Node.MsgsGenerated * 100:.2f}%\n")
+    return results
 
 
 if __name__ == '__main__':
     # Example usage
     run_simulation(N=10, P=0.2, MaxSimtime=100000.0)
+
+    # A million devices on the aggregate backend
+    run_simulation(N=10 ** 6, P=1e-6, MaxSimtime=10 ** 7, backend='aggregate')
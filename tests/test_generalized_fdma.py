@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from theory.FDMA.generalized_fdma import Generalized_FDMA
+from theory.FDMA.simplified_fdma import Simplified_FDMA
+from theory.TDMA.generalized_tdma import Generalized_TDMA
+
+
+def test_single_packet_messages_match_simplified_fdma():
+    M = np.array([1, 2, 10, 100, 1000])[:, None]
+    P = np.linspace(0.01, 0.99, 99)
+    np.testing.assert_allclose(Generalized_FDMA().calculate_delay(M, 1, P), Simplified_FDMA().calculate_delay(M, P))
+
+
+def test_L_packet_messages_are_M_D_1_with_service_time_LM():
+    M, L, P = 10, 4, 0.5
+    service = L * M
+    assert Generalized_FDMA().calculate_delay(M, L, P) == service + service * P / (2 * (1 - P))
+
+
+def test_fdma_is_slower_than_tdma_by_M_over_2_minus_1_at_L_1():
+    M = np.array([1, 10, 100])[:, None]
+    P = np.linspace(0.01, 0.99, 99)
+    difference = Generalized_FDMA().calculate_delay(M, 1, P) - Generalized_TDMA().calculate_delay(M, 1, P)
+    np.testing.assert_allclose(difference, np.broadcast_to(M / 2 - 1, difference.shape))
@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# The CLI in a fresh interpreter whose worker processes are spawned, as on macOS and Windows
+SPAWNED_CLI = """
+import multiprocessing
+import sys
+
+sys.path.insert(0, sys.argv[1])
+import mac_toolbox
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn')
+    mac_toolbox.main(sys.argv[2:])
+"""
+
+
+def test_csma_replications_run_in_spawned_workers():
+    args = ['csma', '--replications', '2', '--processes', '2', '--time', '300', '--seed', '1', '--json']
+    output = subprocess.run([sys.executable, '-c', SPAWNED_CLI, ROOT, *args], check=True, capture_output=True,
+                            text=True, timeout=300).stdout
+    results = json.loads(output)
+    assert len(results['replications']) == 2
+    assert results['mean_transmit_time']['mean'] > 0
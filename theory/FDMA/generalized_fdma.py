@@ -1,5 +1,10 @@
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from plotting import show_figure
+from theory.analytic import delay_surface, masked_delay
 
 class Generalized_FDMA():
     def __init__(self, M=10, R=1, L=1, T=0.1, lamda=0.5, mu=1):
@@ -19,59 +24,48 @@ class Generalized_FDMA():
         P = P if P is not None else self.P
 
         '''
-        Calculate the average delay in a system with M servers
+        Calculate the average delay in a system with M servers: a message of L packets is sent
+        in L M slots on its 1/M of the bandwidth (M/D/1), D = M L + M L P / (2 (1 - P)).
+        M, L and P may be NumPy arrays; they are broadcast against each other.
         '''
-        if P >= 1:
-            return 0  # Return 0 if utilization is 100% or more to avoid division by zero
-        return M * (L - 1 / 2) + ((M * L ** 2) / L) * (P / (2 * (1 - P))) + 1
+        # 0 if utilization is 100% or more to avoid division by zero
+        return masked_delay(lambda M, L, P: M * L + M * L * P / (2 * (1 - P)), 0, M, L, P)
 
     
-    def plot_delay_vs_M(self, M=None, L=None, P=None):
+    def delay_vs_M_data(self, M=None, L=None, P=None):
         '''
-        Plot the average delay as a function of the number of servers M
+        Figure spec of the average delay as a function of the number of servers M
         '''
         M = M if M is not None else self.M
         L = L if L is not None else self.L
         P = P if P is not None else self.P
 
         M = np.arange(1, M, 1)
-        delays = [self.calculate_delay(m, L, P) for m in M]
-        plt.plot(M, delays)
-        plt.xlabel('Number of servers M')
-        plt.ylabel('Expected Delay')
-        #plt.yscale('log')
-        plt.title('Expected Delay vs. number of servers M')
-        plt.grid()
-        plt.legend()
-        plt.show()
+        delays = self.calculate_delay(M, L, P)
+        return {'title': 'Expected Delay vs. number of servers M', 'xlabel': 'Number of servers M', 'ylabel': 'Expected Delay',
+                'series': [{'x': M, 'y': delays}]}
 
-    def plot_delay_vs_P(self, L=None):
+    def delay_vs_P_data(self, L=None):
         '''
-        Plot the average delay as a function of the utilization P
+        Figure spec of the average delay as a function of the utilization P
         '''
         L = L if L is not None else self.L
 
         P = 1 # maximum value
         P_values = np.linspace(0, P, 100)  # Generate 100 points for smooth plotting
         P_values = np.delete(P_values, [0, 99])
-        
-        delays_0 = [self.calculate_delay(5, L, p) for p in P_values]
-        delays_1 = [self.calculate_delay(10, L, p) for p in P_values]
-        delays_2 = [self.calculate_delay(100, L, p) for p in P_values]
-        delays_3 = [self.calculate_delay(1000, L, p) for p in P_values]
-        
-        plt.plot(P_values, delays_0, label='M=5')
-        plt.plot(P_values, delays_1, label='M=10')
-        plt.plot(P_values, delays_2, label='M=100')
-        plt.plot(P_values, delays_3, label='M=1000')
-        
-        plt.xlabel('Throughput S')
-        plt.yscale('log')
-        plt.ylabel('Expected delay')
-        plt.title('FDMA Expected Delay vs. Throughput')
-        plt.legend()
-        plt.grid()
-        plt.show()
+
+        M_values = [5, 10, 100, 1000]
+        delays = delay_surface(self, M_values, P_values, L)
+        return {'title': 'FDMA Expected Delay vs. Throughput', 'xlabel': 'Throughput S', 'ylabel': 'Expected delay', 'yscale': 'log',
+                'series': [{'x': P_values, 'y': d, 'label': f'M={M}'} for M, d in zip(M_values, delays)]}
+
+    def plot_delay_vs_M(self, M=None, L=None, P=None):
+        show_figure(self.delay_vs_M_data(M, L, P))
+
+    def plot_delay_vs_P(self, L=None):
+        show_figure(self.delay_vs_P_data(L))
+
 
 if __name__ == '__main__':
     agent = Generalized_FDMA()
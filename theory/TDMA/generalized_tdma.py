@@ -1,80 +1,72 @@
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
 
-class Generalized_FDMA():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from plotting import show_figure
+from theory.analytic import delay_surface, masked_delay
+
+class Generalized_TDMA():
     def __init__(self, M=10, R=1, L=1, T=0.1, lamda=0.5, mu=1):
         self.M = M
         self.R = R
-        self.L = L
-        self.T = T
-        self.Tc = self.T * self.M
+        self.L = L  # Packets per message, sent one per frame
+        self.T = T  # Slot time
+        self.Tc = self.T * self.M  # Frame time
         self.lamda = lamda
         self.mu = mu
         self.P = self.lamda * self.L * self.Tc
-    
+
     def calculate_delay(self, M=None, L=None, P=None):
-        # Use default values from instance attributes if parameters are not provided
+        '''
+        Calculate the average delay (in slots) of a message of L packets in a TDMA system with
+        M users: half a frame until the own slot, L - 1 further frames, the last slot, and the
+        M/D/1 queueing of messages that take L frames each,
+            D = M (L - 1/2) + 1 + M L P / (2 (1 - P)).
+        M, L and P may be NumPy arrays; they are broadcast against each other.
+        '''
         M = M if M is not None else self.M
         L = L if L is not None else self.L
         P = P if P is not None else self.P
 
-        '''
-        Calculate the average delay in a system with M servers
-        '''
-        for i in range(1, d):
-            delay += d[i] * D / self.Tc
-
-        return delay
+        # System overload (P >= 1) gives infinite delay
+        return masked_delay(lambda M, L, P: M * (L - 1 / 2) + 1 + M * L * P / (2 * (1 - P)), float('inf'), M, L, P)
 
-    
-    def plot_delay_vs_M(self, M=None, L=None, P=None):
+    def delay_vs_M_data(self, M=None, L=None, P=None):
         '''
-        Plot the average delay as a function of the number of servers M
+        Figure spec of the average delay as a function of the number of users M
         '''
         M = M if M is not None else self.M
         L = L if L is not None else self.L
         P = P if P is not None else self.P
 
-        M = np.arange(1, M, 1)
-        delays = [self.calculate_delay(m, L, P) for m in M]
-        plt.plot(M, delays)
-        plt.xlabel('Number of servers M')
-        plt.ylabel('Expected Delay')
-        #plt.yscale('log')
-        plt.title('Expected Delay vs. number of servers M')
-        plt.grid()
-        plt.legend()
-        plt.show()
+        M_values = np.arange(1, M + 1, 1)
+        delays = self.calculate_delay(M_values, L, P)
+        return {'title': 'Expected Delay vs. Number of Servers M (Generalized TDMA)', 'xlabel': 'Number of servers M',
+                'ylabel': 'Expected Delay', 'series': [{'x': M_values, 'y': delays, 'label': f'L={L}, P={P:.2f}'}]}
 
-    def plot_delay_vs_P(self, L=None):
+    def delay_vs_P_data(self, L=None, P_max=1):
         '''
-        Plot the average delay as a function of the utilization P
+        Figure spec of the average delay as a function of the utilization P
         '''
         L = L if L is not None else self.L
 
-        P = 1 # maximum value
-        P_values = np.linspace(0, P, 100)  # Generate 100 points for smooth plotting
-        P_values = np.delete(P_values, [0, 99])
-        
-        delays_0 = [self.calculate_delay(5, L, p) for p in P_values]
-        delays_1 = [self.calculate_delay(10, L, p) for p in P_values]
-        delays_2 = [self.calculate_delay(100, L, p) for p in P_values]
-        delays_3 = [self.calculate_delay(1000, L, p) for p in P_values]
-        
-        plt.plot(P_values, delays_0, label='M=5')
-        plt.plot(P_values, delays_1, label='M=10')
-        plt.plot(P_values, delays_2, label='M=100')
-        plt.plot(P_values, delays_3, label='M=1000')
-        
-        plt.xlabel('Throughput S')
-        plt.yscale('log')
-        plt.ylabel('Expected delay')
-        plt.title('FDMA Expected Delay vs. Throughput')
-        plt.legend()
-        plt.grid()
-        plt.show()
+        P_values = np.linspace(0.01, P_max, 100)  # Avoid P=0 to prevent division by zero
+        M_values = [5, 10, 100, 1000]
+        delays = delay_surface(self, M_values, P_values, L)
+        return {'title': f'Generalized TDMA Expected Delay vs. Utilization (L={L})', 'xlabel': 'Utilization P',
+                'ylabel': 'Expected Delay', 'yscale': 'log',
+                'series': [{'x': P_values, 'y': d, 'label': f'M={M}'} for M, d in zip(M_values, delays)]}
+
+    def plot_delay_vs_M(self, M=None, L=None, P=None):
+        show_figure(self.delay_vs_M_data(M, L, P))
+
+    def plot_delay_vs_P(self, L=None, P_max=1):
+        show_figure(self.delay_vs_P_data(L, P_max))
+
 
 if __name__ == '__main__':
-    agent = Generalized_FDMA()
+    agent = Generalized_TDMA()
+    print(f"Default delay: {agent.calculate_delay()}")
     agent.plot_delay_vs_P()
-    agent.plot_delay_vs_M()
\ No newline at end of file
+    agent.plot_delay_vs_M()
@@ -1,5 +1,10 @@
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from plotting import show_figure
+from theory.analytic import delay_surface, masked_delay
 
 class Simplified_TDMA:
     def __init__(self, M=10, R=1, lamda=0.1, mu=0.2):
@@ -12,54 +17,41 @@ class Simplified_TDMA:
     def calculate_delay(self, M=None, P=None):
         '''
         Calculate the average delay in a system with M servers (M/D/1).
+        M and P may be NumPy arrays; they are broadcast against each other.
         '''
         M = M if M is not None else self.M
         P = P if P is not None else self.P
 
-        if P >= 1:
-            return float('inf')  # System overload, infinite delay
-        return 1 + M / (2 * (1 - P))
+        # System overload (P >= 1) gives infinite delay
+        return masked_delay(lambda M, P: 1 + M / (2 * (1 - P)), float('inf'), M, P)
 
-    def plot_delay_vs_M(self, M=None, P=None):
+    def delay_vs_M_data(self, M=None, P=None):
         '''
-        Plot the expected delay as a function of the number of servers M.
+        Figure spec of the expected delay as a function of the number of servers M.
         '''
         M = M if M is not None else self.M
         P = P if P is not None else self.P
 
         M_values = np.arange(1, M + 1, 1)
-        delays = [self.calculate_delay(m, P) for m in M_values]
-        plt.plot(M_values, delays, label=f'P={P:.2f}')
-        plt.xlabel('Number of servers M')
-        plt.ylabel('Expected Delay')
-        plt.title('Expected Delay vs. Number of Servers M (TDMA)')
-        plt.grid()
-        plt.legend()
-        plt.show()
+        delays = self.calculate_delay(M_values, P)
+        return {'title': 'Expected Delay vs. Number of Servers M (TDMA)', 'xlabel': 'Number of servers M', 'ylabel': 'Expected Delay',
+                'series': [{'x': M_values, 'y': delays, 'label': f'P={P:.2f}'}]}
 
-    def plot_delay_vs_P(self, P_max=1):
+    def delay_vs_P_data(self, P_max=1):
         '''
-        Plot the average delay as a function of the utilization P.
+        Figure spec of the average delay as a function of the utilization P.
         '''
         P_values = np.linspace(0.01, P_max, 100)  # Avoid P=0 to prevent division by zero
+        M_values = [5, 10, 100, 1000]
+        delays = delay_surface(self, M_values, P_values)
+        return {'title': 'TDMA Expected Delay vs. Utilization', 'xlabel': 'Utilization P', 'ylabel': 'Expected Delay', 'yscale': 'log',
+                'series': [{'x': P_values, 'y': d, 'label': f'M={M}'} for M, d in zip(M_values, delays)]}
 
-        delays_5 = [self.calculate_delay(5, p) for p in P_values]
-        delays_10 = [self.calculate_delay(10, p) for p in P_values]
-        delays_100 = [self.calculate_delay(100, p) for p in P_values]
-        delays_1000 = [self.calculate_delay(1000, p) for p in P_values]
-
-        plt.plot(P_values, delays_5, label='M=5')
-        plt.plot(P_values, delays_10, label='M=10')
-        plt.plot(P_values, delays_100, label='M=100')
-        plt.plot(P_values, delays_1000, label='M=1000')
+    def plot_delay_vs_M(self, M=None, P=None):
+        show_figure(self.delay_vs_M_data(M, P))
 
-        plt.xlabel('Utilization P')
-        plt.yscale('log')
-        plt.ylabel('Expected Delay')
-        plt.title('TDMA Expected Delay vs. Utilization')
-        plt.legend()
-        plt.grid()
-        plt.show()
+    def plot_delay_vs_P(self, P_max=1):
+        show_figure(self.delay_vs_P_data(P_max))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def masked_delay(formula, overload, *args):
+    """
+    Evaluate formula(*args) elementwise on the broadcast NumPy arrays of args, whose last entry is
+    the utilization P. Overloaded points (P >= 1) get `overload` instead of being evaluated.
+    Scalar inputs give a scalar, array inputs an array of the broadcast shape.
+    """
+    arrays = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in args])
+    stable = arrays[-1] < 1
+    delay = np.full(arrays[-1].shape, overload, dtype=float)
+    delay[stable] = formula(*[a[stable] for a in arrays])
+    return delay[()]
+
+
+def delay_surface(model, M, P, L=None):
+    """
+    Delay of `model` on the outer grid of M x P in one vectorized call, of shape (len(M), len(P)).
+    Models with a packet count take L: a scalar keeps that shape, an array gives the M x L x P
+    grid of shape (len(M), len(L), len(P)).
+    """
+    M = np.asarray(M, dtype=float).reshape(-1, 1)
+    P = np.asarray(P, dtype=float).reshape(1, -1)
+    if L is None:
+        return model.calculate_delay(M, P=P)
+    if np.ndim(L) == 0:
+        return model.calculate_delay(M, L, P)
+    L = np.asarray(L, dtype=float).reshape(1, -1, 1)
+    return model.calculate_delay(M[:, :, None], L, P[:, None, :])
+
+
+def delay_comparison(tdma, fdma, M, P, L=1):
+    """
+    Delays of two generalized models (e.g. TDMA and FDMA) on the same M x P design grid at packet
+    count L, each one vectorized call: {'tdma', 'fdma', 'ratio'} of shape (len(M), len(P)), where
+    ratio = tdma / fdma is NaN at overloaded points (P >= 1).
+    """
+    first = delay_surface(tdma, M, P, L)
+    second = delay_surface(fdma, M, P, L)
+    stable = np.broadcast_to(np.asarray(P, dtype=float) < 1, first.shape)
+    ratio = np.full(first.shape, np.nan)
+    ratio[stable] = first[stable] / second[stable]
+    return {'tdma': first, 'fdma': second, 'ratio': ratio}
@@ -0,0 +1,302 @@
+import argparse
+import math
+import os
+import sys
+import time
+from fractions import Fraction
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from theory.diversity_SA.diversity_sa import FrequentDiversity, TimeDiversity, exact_Ps_replacement
+
+# Upper bound on the number of replica choices drawn at once
+CHUNK_ELEMENTS = 1 << 22
+
+def draw_choices(rng, users, l, k, replacement=True):
+    """Channel (or slot) index of each of the k copies sent by each user, shape (users, k)."""
+    if replacement:
+        return rng.integers(0, l, size=(users, k))
+    if k > l:
+        raise ValueError("Without replacement k cannot exceed l")
+    if 2 * k > l:
+        # k distinct channels: the first k of a random permutation of the l channels
+        return np.argpartition(rng.random((users, l)), k - 1, axis=1)[:, :k]
+
+    # Few copies: draw with replacement and redraw the users that picked a channel twice
+    choices = rng.integers(0, l, size=(users, k))
+    redraw = np.arange(users)
+    while len(redraw):
+        rows = np.sort(choices[redraw], axis=1)
+        redraw = redraw[(rows[:, 1:] == rows[:, :-1]).any(axis=1)]
+        choices[redraw] = rng.integers(0, l, size=(len(redraw), k))
+    return choices
+
+def simulate_frames(rng, frames, l, k, G, replacement=True):
+    """
+    Simulate `frames` independent frames of k-replica diversity ALOHA over l channels or slots.
+    Each frame has Poisson(G * l) users, each sending k copies; a user succeeds if one of its
+    copies is alone on its channel (copies of the same user do not collide with each other).
+    Returns (users, successful users).
+    """
+    per_frame = rng.poisson(G * l, frames)
+    users = int(per_frame.sum())
+    if users == 0:
+        return 0, 0
+
+    choices = draw_choices(rng, users, l, k, replacement)
+    frame = np.repeat(np.arange(frames), per_frame)
+    slots = frame[:, None] * l + choices  # Channel index over all frames
+
+    # Count each user once per channel, even if it picked that channel several times
+    ordered = np.sort(slots, axis=1)
+    first = np.ones(ordered.shape, dtype=bool)
+    first[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    occupancy = np.bincount(ordered[first], minlength=frames * l)
+
+    success = (occupancy[slots] == 1).any(axis=1)
+    return users, int(np.count_nonzero(success))
+
+def simulate_Ps(l, k, G, frames=100000, replacement=True, seed=None, batches=20):
+    """
+    Empirical P_s over `frames` frames. The frames are split into batches to estimate the standard error.
+    Returns (P_s, standard error, number of users simulated).
+    """
+    rng = np.random.default_rng(seed)
+    frames_per_chunk = max(1, int(CHUNK_ELEMENTS / max(G * l * k, 1)))
+    batch_Ps = []
+    total_users = total_successes = 0
+    for batch in np.array_split(np.arange(frames), batches):
+        users = successes = 0
+        for start in range(0, len(batch), frames_per_chunk):
+            u, s = simulate_frames(rng, min(frames_per_chunk, len(batch) - start), l, k, G, replacement)
+            users += u
+            successes += s
+        if users:
+            batch_Ps.append(successes / users)
+        total_users += users
+        total_successes += successes
+
+    Ps = total_successes / total_users if total_users else float('nan')
+    se = np.std(batch_Ps, ddof=1) / np.sqrt(len(batch_Ps)) if len(batch_Ps) > 1 else float('nan')
+    return Ps, float(se), total_users
+
+def validate(l, k, G_values, frames=100000, replacement=True, n_values=(1, 2), model='frequency', seed=None):
+    """
+    Empirical P_s, S = G * P_s and beta = (1 - P_s)^n next to the closed forms of FrequentDiversity
+    (model='frequency', l channels) or TimeDiversity (model='time', l slots). With replacement
+    the full formula is used, without replacement 1 - (1 - e^(-kG))^k. Returns one dict per G.
+    """
+    agent = (FrequentDiversity if model == 'frequency' else TimeDiversity)(l, k, G_values[0])
+    seeds = np.random.SeedSequence(seed).spawn(len(G_values))
+    rows = []
+    for G, child in zip(G_values, seeds):
+        Ps, se, users = simulate_Ps(l, k, G, frames, replacement, child)
+        if replacement:
+            Ps_formula = float(agent.calculate_Ps_grid_replacement(l, k, G))
+        else:
+            Ps_formula = float(agent.calculate_Ps_without_replacement(k, G))
+        row = {'model': model, 'l': l, 'k': k, 'G': G, 'replacement': replacement, 'users': users,
+               'Ps_sim': Ps, 'Ps_se': se, 'Ps_formula': Ps_formula,
+               'S_sim': G * Ps, 'S_formula': G * Ps_formula}
+        for n in n_values:
+            row[f'beta{n}_sim'] = (1 - Ps) ** n
+            row[f'beta{n}_formula'] = (1 - Ps_formula) ** n
+        rows.append(row)
+    return rows
+
+def print_validation(rows):
+    n_values = [key[4:-4] for key in rows[0] if key.startswith('beta') and key.endswith('_sim')]
+    header = f"{'G':>6} {'users':>10} {'Ps sim':>9} {'+/-':>8} {'Ps formula':>10} {'S sim':>8} {'S formula':>9}"
+    header += ''.join(f" {'beta' + n + ' sim':>10} {'beta' + n + ' formula':>14}" for n in n_values)
+    print(header)
+    for row in rows:
+        line = (f"{row['G']:>6.3f} {row['users']:>10} {row['Ps_sim']:>9.5f} {row['Ps_se']:>8.5f} {row['Ps_formula']:>10.5f} "
+                f"{row['S_sim']:>8.5f} {row['S_formula']:>9.5f}")
+        line += ''.join(f" {row[f'beta{n}_sim']:>10.3e} {row[f'beta{n}_formula']:>14.3e}" for n in n_values)
+        print(line)
+
+def distinct_channel_probabilities(l, k):
+    """P(S = s) for s = 1..min(k, l), S the number of distinct channels among k picks with replacement."""
+    n = min(k, l)
+    surjections = [sum((-1) ** r * math.comb(s, r) * (s - r) ** k for r in range(s + 1)) for s in range(1, n + 1)]
+    return np.array([float(Fraction(math.comb(l, s) * m, l ** k)) for s, m in zip(range(1, n + 1), surjections)])
+
+def coverage_probability(H, s):
+    """
+    P(H picks uniform over s channels cover all of them), for an array H, from the occupancy
+    recursion P_{t+1}(m) = P_t(m) m / s + P_t(m - 1) (s - m + 1) / s, which has no cancellation.
+    """
+    H = np.asarray(H)
+    top = int(H.max()) if H.size else 0
+    m = np.arange(1, s + 1)
+    occupied = np.zeros(s + 1)  # occupied[m] = P(m channels occupied after t picks)
+    occupied[0] = 1
+    full = np.empty(top + 1)
+    full[0] = occupied[s]
+    for t in range(1, top + 1):
+        occupied[1:] = occupied[1:] * m / s + occupied[:-1] * (s - m + 1) / s
+        occupied[0] = 0
+        full[t] = occupied[s]
+    return full[H]
+
+def draw_picks(rng, trials, l, k, G, s, lam, p):
+    """
+    Trials for a tagged user whose copies occupy s distinct channels, under the sampling
+    distribution (lam, p): Poisson(lam) other users, each of whose k picks lands in the tagged
+    channels with probability p. Only those picks matter: given their number H the user fails
+    with probability coverage_probability(H, s). Returns (N, H, log likelihood ratio of the
+    nominal distribution, Poisson(G l) and p = s / l, to the sampling one).
+    """
+    N = rng.poisson(lam, trials)
+    H = rng.binomial(k * N, p)
+    log_ratio = (lam - G * l) + N * np.log(G * l / lam) + H * np.log(s / (l * p))
+    if s < l:
+        log_ratio += (k * N - H) * np.log((l - s) / (l * (1 - p)))
+    return N, H, log_ratio
+
+def tilted_parameters(l, k, G, s):
+    """
+    Exponential tilt e^(theta H) of the nominal (G l, s / l) that raises the mean of H to s, if it
+    is lower: H is compound Poisson with Binomial(k, p) terms, so the tilt stays in the family,
+        lam = G l (1 - p + p e^theta)^k,  p_theta = p e^theta / (1 - p + p e^theta).
+    """
+    lam, p = G * l, s / l
+
+    def tilt(theta):
+        base = 1 - p + p * math.exp(theta)
+        return lam * base ** k, p * math.exp(theta) / base
+
+    def mean(theta):
+        lam_theta, p_theta = tilt(theta)
+        return lam_theta * k * p_theta
+
+    if mean(0) >= s:
+        return lam, p
+    lo, hi = 0.0, 1.0
+    while mean(hi) < s:
+        lo, hi = hi, 2 * hi
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        lo, hi = (mid, hi) if mean(mid) < s else (lo, mid)
+    return tilt(hi)
+
+def cross_entropy_parameters(rng, l, k, G, s, samples=10000, rho=0.1, max_iter=50):
+    """
+    Multilevel cross-entropy tuning of (lam, p) for the failure of a user on s channels, which
+    needs at least s picks H in its channels. Starting from tilted_parameters, the level is
+    raised to the (1 - rho) quantile of H in each pilot run and lam and p are refitted to the
+    likelihood-weighted elite samples; once the level reaches s, a last refit weights the samples
+    by their failure probability.
+    """
+    lam, p = tilted_parameters(l, k, G, s)
+    for _ in range(max_iter):
+        N, H, log_ratio = draw_picks(rng, samples, l, k, G, s, lam, p)
+        level = min(s, np.quantile(H, 1 - rho))
+        final = level >= s
+        score = coverage_probability(H, s) if final else (H >= level).astype(float)
+        elite = score > 0
+        if not elite.any() or N[elite].sum() == 0:
+            break
+        weights = score[elite] * np.exp(log_ratio[elite] - log_ratio[elite].max())  # Common scale cancels
+        lam = max(float((weights * N[elite]).sum() / weights.sum()), 1e-9)
+        if s < l:
+            p = min(max(float((weights * H[elite]).sum() / (weights * k * N[elite]).sum()), 1e-9), 1 - 1e-9)
+        if final:
+            break
+    return lam, p
+
+def estimate_failure(l, k, G, trials=10 ** 6, pilot=10 ** 4, n_values=(1, 2), seed=None, confidence=0.95):
+    """
+    Importance-sampling estimate of the failure probability q = 1 - P_s (with replacement) and of
+    beta = q^n, stratified over the number s of distinct tagged channels, whose probabilities
+    are exact: q = sum_s P(S = s) q_s. Each stratum gets its own cross-entropy tuned sampling
+    distribution, each trial contributes its likelihood ratio times its failure probability given
+    H (conditional Monte Carlo), and the trials are split across the strata in proportion to
+    P(S = s) times the pilot standard deviation (Neyman allocation). Returns a dict with the estimate, its confidence
+    half-width and relative error, the exact value, the variance reduction over crude Monte Carlo
+    with as many trials (pilots excluded) and the crude trials needed for the same relative error.
+    """
+    from scipy.stats import norm  # Only needed for the confidence level
+
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    strata = distinct_channel_probabilities(l, k)
+    parameters = [cross_entropy_parameters(rng, l, k, G, s, pilot) for s in range(1, len(strata) + 1)]
+
+    spread = []
+    for s, (lam, p) in enumerate(parameters, start=1):
+        _, H, log_ratio = draw_picks(rng, pilot, l, k, G, s, lam, p)
+        spread.append(np.std(coverage_probability(H, s) * np.exp(log_ratio)))
+    allocation = strata * np.array(spread)
+    allocation = allocation / allocation.sum() if allocation.sum() > 0 else strata
+    counts = np.maximum(pilot, np.round(allocation * trials)).astype(int)
+
+    q = variance = 0.0
+    per_stratum = []
+    for s, ((lam, p), weight, n) in enumerate(zip(parameters, strata, counts), start=1):
+        total = total_squares = 0.0
+        for first in range(0, n, CHUNK_ELEMENTS):
+            _, H, log_ratio = draw_picks(rng, min(CHUNK_ELEMENTS, n - first), l, k, G, s, lam, p)
+            values = coverage_probability(H, s) * np.exp(log_ratio)
+            total += values.sum()
+            total_squares += (values ** 2).sum()
+        q_s = float(total / n)
+        var_s = max(total_squares / n - q_s ** 2, 0.0) / n
+        q += weight * q_s
+        variance += weight ** 2 * var_s
+        per_stratum.append({'s': s, 'P(S=s)': float(weight), 'q_s': q_s, 'trials': int(n), 'lam': lam, 'p': p})
+
+    z = norm.ppf((1 + confidence) / 2)
+    total_trials = int(counts.sum())
+    relative_error = np.sqrt(variance) / q if q > 0 else float('inf')
+    result = {
+        'l': l, 'k': k, 'G': G,
+        'q': q,
+        'q_half_width': float(z * np.sqrt(variance)),
+        'q_relative_error': float(relative_error),
+        'q_exact': exact_Ps_replacement(l, k, G, complement=True),
+        'trials': total_trials,
+        'seconds': time.perf_counter() - start,
+        # Crude MC with the same trials has variance q (1 - q) / trials
+        'variance_reduction': float(q * (1 - q) / (variance * total_trials)) if variance > 0 else float('inf'),
+        'crude_trials_needed': float((1 - q) / (q * relative_error ** 2)) if q > 0 and variance > 0 else float('inf'),
+        'strata': per_stratum,
+    }
+    for n in n_values:
+        # Independent attempts: beta = q^n, relative error n times that of q (delta method)
+        result[f'beta{n}'] = q ** n
+        result[f'beta{n}_relative_error'] = float(n * relative_error)
+        result[f'beta{n}_exact'] = result['q_exact'] ** n
+    return result
+
+def print_rare_event(result, n_values=(1, 2)):
+    print(f"l={result['l']} k={result['k']} G={result['G']}: {result['trials']} trials in {result['seconds']:.2f} s")
+    print(f"  q = 1 - Ps = {result['q']:.6e} +/- {result['q_half_width']:.2e} (relative error {result['q_relative_error']:.2e}),"
+          f" exact {result['q_exact']:.6e}")
+    for n in n_values:
+        print(f"  beta{n} = {result[f'beta{n}']:.6e} (relative error {result[f'beta{n}_relative_error']:.2e}),"
+              f" exact {result[f'beta{n}_exact']:.6e}")
+    print(f"  variance reduction {result['variance_reduction']:.3e}; crude MC would need {result['crude_trials_needed']:.3e} trials")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte Carlo check of the diversity slotted ALOHA formulas.')
+    parser.add_argument('--l', type=int, default=8, help='number of channels (slots for time diversity)')
+    parser.add_argument('--k', type=int, default=2, help='copies sent per user')
+    parser.add_argument('--G', type=float, nargs='+', default=[0.1, 0.2, 0.4, 0.6, 0.8])
+    parser.add_argument('--frames', type=int, default=200000)
+    parser.add_argument('--without-replacement', action='store_true')
+    parser.add_argument('--model', choices=['frequency', 'time'], default='frequency')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--rare-event', action='store_true',
+                        help='estimate the failure probability and beta by importance sampling instead')
+    parser.add_argument('--trials', type=int, default=10 ** 6, help='importance sampling trials per G')
+    args = parser.parse_args()
+
+    if args.rare_event:
+        seeds = np.random.SeedSequence(args.seed).spawn(len(args.G))
+        for G, child in zip(args.G, seeds):
+            print_rare_event(estimate_failure(args.l, args.k, G, args.trials, seed=child))
+        sys.exit()
+
+    rows = validate(args.l, args.k, args.G, args.frames, not args.without_replacement, model=args.model, seed=args.seed)
+    print_validation(rows)
@@ -1,13 +1,152 @@
 import math
+import os
+import sys
+from collections import OrderedDict
+from decimal import Decimal, localcontext
 import numpy as np
-import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from plotting import show_figure
+from theory.diversity_SA.smax import exact_ps_coefficients, ps_coefficients
+
+# Upper bound on the number of exponentials evaluated at once by calculate_Ps_grid_replacement
+GRID_CHUNK_ELEMENTS = 1 << 22
+# Relative error of P_s above which a point is recomputed in decimal arithmetic
+PS_RTOL = 1e-12
+# Precision limit (significant digits) of the decimal fallback
+MAX_DIGITS = 10000
+
+def exact_Ps_replacement(l, k, G, rtol=PS_RTOL, complement=False):
+    """
+    P_s (with replacement) at a single load G from the exact coefficients, in decimal arithmetic
+    whose precision is doubled until the cancellation of the alternating sum is below rtol.
+    With complement=True the failure probability 1 - P_s, to the same relative accuracy.
+    """
+    w, a = exact_ps_coefficients(l, k)
+    G = Decimal(float(G))  # Exact conversion
+    digits = 40
+    while True:
+        with localcontext() as context:
+            context.prec = digits
+            terms = [Decimal(x.numerator) / x.denominator * (-Decimal(y.numerator) / y.denominator * G).exp()
+                     for x, y in zip(w, a)]
+            Ps = 1 - sum(terms) if complement else sum(terms)
+            error = (len(terms) + 1) * (1 + sum(abs(term) for term in terms)) * Decimal(10) ** -digits
+            if error <= Decimal(rtol) * abs(Ps) or digits >= MAX_DIGITS:
+                return float(Ps)
+        digits *= 2
+
+def calculate_Ps_grid_replacement(l, k, G):
+    """
+    P_s (with replacement) for every combination of l, k and G in one call.
+    Each argument is a scalar or a 1-D array; the result has shape l.shape + k.shape + G.shape.
+    The full formula is evaluated in its compact form (smax.exact_ps_coefficients), min(k, l)
+    exponentials per point instead of an O(l^2) signed-binomial sum, and the points where the
+    float64 rounding error bound exceeds PS_RTOL are recomputed with exact_Ps_replacement.
+    """
+    l_values = np.atleast_1d(l).astype(int)
+    k_values = np.atleast_1d(k).astype(int)
+    G_values = np.atleast_1d(G).astype(float)
+    Ps = np.empty((len(l_values), len(k_values), len(G_values)))
+
+    for i, n in enumerate(l_values.tolist()):
+        for j, kk in enumerate(k_values.tolist()):
+            w, a = ps_coefficients(n, kk)
+            step = max(1, GRID_CHUNK_ELEMENTS // len(w))
+            for start in range(0, len(G_values), step):
+                g = G_values[start:start + step]
+                terms = w * np.exp(-np.outer(g, a))
+                values = terms.sum(axis=1)
+                # Rounding of the coefficients, the exponentials and the sum
+                bound = (len(w) + 2) * np.finfo(float).eps * np.abs(terms).sum(axis=1)
+                for c in np.nonzero(bound > PS_RTOL * np.abs(values))[0]:
+                    values[c] = exact_Ps_replacement(n, kk, g[c])
+                Ps[i, j, start:start + step] = values
+
+    return Ps.reshape(np.shape(l) + np.shape(k) + np.shape(G))
+
+class PsCache:
+    """
+    Bounded LRU cache of P_s (with replacement) keyed on (l, k, G), shared by the diversity models.
+    With a path, the table is loaded from that .npz file if it exists and save() writes it back,
+    so later sessions only compute the points they have not seen yet.
+    """
+    def __init__(self, maxsize=1000000, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.values = OrderedDict()  # (l, k, G) -> P_s, least recently used first
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, l, k, G):
+        """Same as calculate_Ps_grid_replacement(l, k, G), computing only the missing points."""
+        l_values = np.atleast_1d(l).astype(int).tolist()
+        k_values = np.atleast_1d(k).astype(int).tolist()
+        G_values = np.atleast_1d(G).astype(float).tolist()
+        Ps = np.empty((len(l_values), len(k_values), len(G_values)))
+
+        missing = {}  # (l, k) -> G values to compute
+        for a, n in enumerate(l_values):
+            for b, kk in enumerate(k_values):
+                for c, g in enumerate(G_values):
+                    key = (n, kk, g)
+                    value = self.values.get(key)
+                    if value is None:
+                        missing.setdefault((n, kk), []).append(g)
+                        Ps[a, b, c] = np.nan
+                    else:
+                        self.values.move_to_end(key)
+                        Ps[a, b, c] = value
+        self.hits += Ps.size - sum(len(v) for v in missing.values())
+
+        for (n, kk), gs in missing.items():
+            gs = list(dict.fromkeys(gs))
+            self.misses += len(gs)
+            for g, value in zip(gs, calculate_Ps_grid_replacement(n, kk, np.array(gs)).tolist()):
+                self.values[(n, kk, g)] = value
+        if missing:
+            Ps = self.lookup(l_values, k_values, G_values, Ps)
+            while len(self.values) > self.maxsize:
+                self.values.popitem(last=False)
+
+        return Ps.reshape(np.shape(l) + np.shape(k) + np.shape(G))
+
+    def lookup(self, l_values, k_values, G_values, Ps):
+        """Fill the NaN entries of Ps from the cache."""
+        for a, b, c in zip(*np.nonzero(np.isnan(Ps))):
+            Ps[a, b, c] = self.values[(l_values[a], k_values[b], G_values[c])]
+        return Ps
+
+    def save(self, path=None):
+        path = path or self.path
+        keys = np.array(list(self.values.keys()), dtype=float).reshape(-1, 3)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, l=keys[:, 0].astype(int), k=keys[:, 1].astype(int), G=keys[:, 2],
+                 Ps=np.fromiter(self.values.values(), dtype=float, count=len(self.values)))
+        os.replace(tmp, path)
+
+    def load(self, path):
+        with np.load(path) as table:
+            for n, kk, g, value in zip(table['l'].tolist(), table['k'].tolist(), table['G'].tolist(), table['Ps'].tolist()):
+                self.values[(n, kk, g)] = value
+        while len(self.values) > self.maxsize:
+            self.values.popitem(last=False)
+
+# Cache shared by FrequentDiversity and TimeDiversity unless they are given their own
+PS_CACHE = PsCache()
 
 class FrequentDiversity:
-    def __init__(self, l, k, G):
+    def __init__(self, l, k, G, cache=None):
         """Initialize the class."""
         self.l = l
         self.k = k
         self.G = G
+        self.cache = cache if cache is not None else PS_CACHE  # P_s cache used by the plots
 
     def binomial_coefficient(self, n, k):
         """Calculate the binomial coefficient (n choose k)."""
@@ -16,32 +155,32 @@ class FrequentDiversity:
         return math.comb(n, k)
 
     def calculate_Ps_full_formula_replacement(self, l=8, k=1, G=0.8):
-        """Calculate P_s (probability message is sent successfully) using the full given formula, including k."""
+        """
+        Calculate P_s (probability message is sent successfully) using the full given formula, including k.
+        Evaluated in its compact form, accurate for any l (see calculate_Ps_grid_replacement).
+        """
         l = l or self.l
         k = k or self.k
         G = G or self.G
 
-        Ps = 0  # Initialize P_s
-
-        for m in range(1, l + 1):  # Outer summation over m
-            # Calculate the inner summation over v
-            inner_sum = 0
-            for v in range(0, l - m + 1):
-                coefficient = (-1)**v * self.binomial_coefficient(l - m, v)
-                inner_sum += coefficient * np.exp(-G * l * (1 - (1 - (m + v) / l)**k))
-            
-            # Calculate the remaining terms of the formula
-            term_1 = 1 - (1 - m / l)**k
-            binomial_term = self.binomial_coefficient(l, m)
-            
-            # Update P_s with the current term
-            Ps += term_1 * binomial_term * inner_sum
+        return calculate_Ps_grid_replacement(l, k, G)[()]
 
-        return Ps
+    def calculate_Ps_grid_replacement(self, l=None, k=None, G=None):
+        """Batched P_s over arrays of l, k and G (see calculate_Ps_grid_replacement), served from self.cache."""
+        l = self.l if l is None else l
+        k = self.k if k is None else k
+        G = self.G if G is None else G
+        return self.cache.get(l, k, G)
 
-    def plot_throughput_vs_activity_factor_replacement(self, l=8, G=0.8):
+    def calculate_Ps_without_replacement(self, k=None, G=None):
+        """P_s without replacement when each of the k copies collides independently: 1 - (1 - e^(-kG))^k."""
+        k = self.k if k is None else k
+        G = self.G if G is None else G
+        return 1 - (1 - np.exp(-k * np.asarray(G, dtype=float))) ** k
+
+    def throughput_vs_activity_factor_replacement_data(self, l=8, G=0.8):
         """
-        Plot throughput (S) vs activity factor (Ra) (with replacement).
+        Figure spec of throughput (S) vs activity factor (Ra) (with replacement).
         - Plot 4 line with k = 1,2,3,4
         - G is the arrival rate parameter
         - L is the total number of channels
@@ -53,29 +192,21 @@ class FrequentDiversity:
         G = G or self.G
 
         G_values = np.linspace(0, G, 50)  # Generate G values for the plot
-        for k in range(1, 5):  # Loop over k values
-            # Precompute P_s values
-            Ps_values = [self.calculate_Ps_full_formula_replacement(l, k, g) for g in G_values]
-
-
+        k_values = np.arange(1, 5)
+        Ps_grid = self.calculate_Ps_grid_replacement(l, k_values, G_values)  # P_s for every (k, G)
+        series = []
+        for k, Ps_values in zip(k_values, Ps_grid):  # Loop over k values
             # Calculate Throughput (S) and Activity Factor (Ra)
-            S = [G_values[i] * Ps_values[i] for i in range(len(G_values))]
-            Ra = [1 / Ps_values[i] if Ps_values[i] != 0 else 0 for i in range(len(G_values))]
-
-            # Plot throughput vs activity factor
-            plt.plot(S, Ra, label=f'k={k}')
+            S = G_values * Ps_values
+            Ra = np.divide(1, Ps_values, out=np.zeros_like(Ps_values), where=Ps_values != 0)
+            series.append({'x': S, 'y': Ra, 'label': f'k={k}'})
 
-        # Add plot labels and legend
-        plt.ylabel('Activity Factor (Ra)')
-        plt.xlabel('Throughput (S)')
-        plt.title('Throughput vs Activity Factor')
-        plt.legend()
-        plt.grid()
-        plt.show()
+        return {'title': 'Throughput vs Activity Factor', 'xlabel': 'Throughput (S)', 'ylabel': 'Activity Factor (Ra)',
+                'series': series}
 
-    def plot_throughput_vs_activity_factor_without_replacement(self, G=0.8):
+    def throughput_vs_activity_factor_without_replacement_data(self, G=0.8):
         """
-        Plot throughput (S) vs activity factor (Ra) (without replacement).
+        Figure spec of throughput (S) vs activity factor (Ra) (without replacement).
         - Plot 4 line with k = 1,2,3,4
         - G is the arrival rate parameter
         - L is the total number of channels
@@ -85,46 +216,35 @@ class FrequentDiversity:
         """
         G = G or self.G
         G_values = np.linspace(0, G, 50)  # Generate G values for the plot
+        series = []
         for k in range(1, 5):  # Loop over k values
-            # Precompute P_s values
-            Ps_values = [1 - (1 - np.exp(-k * g)) ** k for g in G_values]
+            Ps_values = self.calculate_Ps_without_replacement(k, G_values)
 
             # Calculate Throughput (S) and Activity Factor (Ra)
-            S = [G_values[i] * Ps_values[i] for i in range(len(G_values))]
-            Ra = [1 / Ps_values[i] if Ps_values[i] != 0 else 0 for i in range(len(G_values))]
-
-            # Plot throughput vs activity factor
-            plt.plot(S, Ra, label=f'k={k}')
+            S = G_values * Ps_values
+            Ra = np.divide(1, Ps_values, out=np.zeros_like(Ps_values), where=Ps_values != 0)
+            series.append({'x': S, 'y': Ra, 'label': f'k={k}'})
 
-        # Add plot labels and legend
-        plt.ylabel('Activity Factor (Ra)')
-        plt.xlabel('Throughput (S)')
-        plt.title('Throughput vs Activity Factor')
-        plt.legend()
-        plt.grid()
-        plt.show()
+        return {'title': 'Throughput vs Activity Factor', 'xlabel': 'Throughput (S)', 'ylabel': 'Activity Factor (Ra)',
+                'series': series}
 
-    def plot_throughput_vs_activity_factor_without_replacement_short(self, Ra=1.8):
+    def throughput_vs_activity_factor_without_replacement_short_data(self, Ra=1.8):
         '''
-        Plot throughput (S) vs activity factor (Ra) (without replacement).
+        Figure spec of throughput (S) vs activity factor (Ra) (without replacement).
         In this version, we use the simplified formula of realationship between Ra and S.
         '''
         Ra = np.linspace(1, 1.8, 100)
+        series = []
         for k in range(1, 5):
             S = - (1 / (k * Ra)) * np.log(1 - (1 - 1 / Ra) ** (1/k))
-            plt.plot(S, Ra, label=f'k={k}')
+            series.append({'x': S, 'y': Ra, 'label': f'k={k}'})
 
-        # Add plot labels and legend
-        plt.ylabel('Activity Factor (Ra)')
-        plt.xlabel('Throughput (S)')
-        plt.title('Throughput vs Activity Factor')
-        plt.legend()
-        plt.grid()
-        plt.show()
+        return {'title': 'Throughput vs Activity Factor', 'xlabel': 'Throughput (S)', 'ylabel': 'Activity Factor (Ra)',
+                'series': series}
 
-    def plot_beta_vs_Smax_replacement(self, G=0.8, l=16):
+    def beta_vs_Smax_replacement_data(self, G=0.8, l=16):
         """
-        Plot maximum throughput (Smax) vs beta (maximum probability of >= n times fail transmission ).
+        Figure spec of maximum throughput (Smax) vs beta (maximum probability of >= n times fail transmission ).
         - Plot beta vs Smax by varying G
         - The function plot by calculating Smax and beta by varying G
         """
@@ -132,62 +252,56 @@ class FrequentDiversity:
         G = G or self.G
 
         G_values = np.linspace(0, G, 100)  # Generate beta values
+        k_values = np.arange(1, 5)
+        Ps_grid = self.calculate_Ps_grid_replacement(l, k_values, G_values)  # P_s for every (k, G)
+        series = []
         for n in range(1, 3):
-            for k in range(1, 5):
-                Ps_values = [self.calculate_Ps_full_formula_replacement(l, k, g) for g in G_values]
-                S = [G_values[i] * Ps_values[i] for i in range(len(G_values))]
-                beta = [(1 - Ps_values[i])**n for i in range(len(G_values))]
-
-                # Plot beta vs Smax
-                if n == 1:
-                    plt.plot(beta, S, label=f'n={n}, k={k}', linestyle='--')
-                else:
-                    plt.plot(beta, S, label=f'n={n}, k={k}')
-
-        # Plot beta vs Smax
-        plt.xlabel('Beta')
-        plt.xlim(0, 0.1)
-        plt.ylabel('Smax')
-        plt.legend()
-        plt.title('Beta vs Smax')
-        plt.grid()
-        plt.show()
+            for k, Ps_values in zip(k_values, Ps_grid):
+                S = G_values * Ps_values
+                beta = (1 - Ps_values) ** n
+                series.append({'x': beta, 'y': S, 'label': f'n={n}, k={k}', 'linestyle': '--' if n == 1 else '-'})
 
-    def plot_beta_vs_Smax_without_replacement(self):
+        return {'title': 'Beta vs Smax', 'xlabel': 'Beta', 'ylabel': 'Smax', 'xlim': (0, 0.1), 'series': series}
+
+    def beta_vs_Smax_without_replacement_data(self):
         """
-        Plot maximum throughput (Smax) vs beta (maximum probability of >= n times fail transmission).
+        Figure spec of maximum throughput (Smax) vs beta (maximum probability of >= n times fail transmission).
         - Plot beta vs Smax by varying G
         - The function plot by calculating Smax and beta by varying G
         """
 
         beta = np.linspace(0, 0.1, 100)
-
+        series = []
         for n in range(1, 3):
             for k in range(1, 5):
-                Ps_values = [(1 - b ** (1/n)) for b in beta]
-                S = [-(Ps / k) * np.log(1 - (1 - Ps) ** (1/k)) for Ps in Ps_values]
-
-                # Plot beta vs Smax
-                if n == 1:
-                    plt.plot(beta, S, label=f'n={n}, k={k}', linestyle='--')
-                else:
-                    plt.plot(beta, S, label=f'n={n}, k={k}')
-
-        # Plot beta vs Smax
-        plt.xlabel('Beta')
-        plt.xlim(0, 0.1)
-        plt.ylabel('Smax')
-        plt.legend()
-        plt.title('Beta vs Smax')
-        plt.grid()
-        plt.show()
+                Ps_values = 1 - beta ** (1/n)
+                S = -(Ps_values / k) * np.log(1 - (1 - Ps_values) ** (1/k))
+                series.append({'x': beta, 'y': S, 'label': f'n={n}, k={k}', 'linestyle': '--' if n == 1 else '-'})
+
+        return {'title': 'Beta vs Smax', 'xlabel': 'Beta', 'ylabel': 'Smax', 'xlim': (0, 0.1), 'series': series}
+
+    def plot_throughput_vs_activity_factor_replacement(self, l=8, G=0.8):
+        show_figure(self.throughput_vs_activity_factor_replacement_data(l, G))
+
+    def plot_throughput_vs_activity_factor_without_replacement(self, G=0.8):
+        show_figure(self.throughput_vs_activity_factor_without_replacement_data(G))
+
+    def plot_throughput_vs_activity_factor_without_replacement_short(self, Ra=1.8):
+        show_figure(self.throughput_vs_activity_factor_without_replacement_short_data(Ra))
+
+    def plot_beta_vs_Smax_replacement(self, G=0.8, l=16):
+        show_figure(self.beta_vs_Smax_replacement_data(G, l))
+
+    def plot_beta_vs_Smax_without_replacement(self):
+        show_figure(self.beta_vs_Smax_without_replacement_data())
 
 class TimeDiversity:
-    def __init__(self, l, k, G):
+    def __init__(self, l, k, G, cache=None):
         """Initialize the class."""
         self.l = l
         self.k = k
         self.G = G
+        self.cache = cache if cache is not None else PS_CACHE  # P_s cache used by the plots
 
     def binomial_coefficient(self, n, k):
         """Calculate the binomial coefficient (n choose k)."""
@@ -196,32 +310,32 @@ class TimeDiversity:
         return math.comb(n, k)
 
     def calculate_Ps_full_formula_replacement(self, l=8, k=1, G=0.8):
-        """Calculate P_s (probability message is sent successfully) using the full given formula, including k."""
+        """
+        Calculate P_s (probability message is sent successfully) using the full given formula, including k.
+        Evaluated in its compact form, accurate for any l (see calculate_Ps_grid_replacement).
+        """
         l = l or self.l
         k = k or self.k
         G = G or self.G
 
-        Ps = 0  # Initialize P_s
-
-        for m in range(1, l + 1):  # Outer summation over m
-            # Calculate the inner summation over v
-            inner_sum = 0
-            for v in range(0, l - m + 1):
-                coefficient = (-1)**v * self.binomial_coefficient(l - m, v)
-                inner_sum += coefficient * np.exp(-G * l * (1 - (1 - (m + v) / l)**k))
-            
-            # Calculate the remaining terms of the formula
-            term_1 = 1 - (1 - m / l)**k
-            binomial_term = self.binomial_coefficient(l, m)
-            
-            # Update P_s with the current term
-            Ps += term_1 * binomial_term * inner_sum
+        return calculate_Ps_grid_replacement(l, k, G)[()]
 
-        return Ps
+    def calculate_Ps_grid_replacement(self, l=None, k=None, G=None):
+        """Batched P_s over arrays of l, k and G (see calculate_Ps_grid_replacement), served from self.cache."""
+        l = self.l if l is None else l
+        k = self.k if k is None else k
+        G = self.G if G is None else G
+        return self.cache.get(l, k, G)
 
-    def plot_throughput_vs_activity_factor_replacement(self, l=8, G=0.8):
+    def calculate_Ps_without_replacement(self, k=None, G=None):
+        """P_s without replacement when each of the k copies collides independently: 1 - (1 - e^(-kG))^k."""
+        k = self.k if k is None else k
+        G = self.G if G is None else G
+        return 1 - (1 - np.exp(-k * np.asarray(G, dtype=float))) ** k
+
+    def throughput_vs_activity_factor_replacement_data(self, l=8, G=0.8):
         """
-        Plot throughput (S) vs activity factor (Ra) (with replacement).
+        Figure spec of throughput (S) vs activity factor (Ra) (with replacement).
         - Plot 4 line with k = 1,2,3,4
         - G is the arrival rate parameter
         - L is the total number of channels
@@ -232,7 +346,21 @@ class TimeDiversity:
         l = l or self.l
         G = G or self.G
 
-        G_values = np.linspace
+        G_values = np.linspace(0, G, 50)  # Generate G values for the plot
+        k_values = np.arange(1, 5)
+        Ps_grid = self.calculate_Ps_grid_replacement(l, k_values, G_values)  # P_s for every (k, G)
+        series = []
+        for k, Ps_values in zip(k_values, Ps_grid):  # Loop over k values
+            # Calculate Throughput (S) and Activity Factor (Ra)
+            S = G_values * Ps_values
+            Ra = np.divide(1, Ps_values, out=np.zeros_like(Ps_values), where=Ps_values != 0)
+            series.append({'x': S, 'y': Ra, 'label': f'k={k}'})
+
+        return {'title': 'Throughput vs Activity Factor (time diversity)', 'xlabel': 'Throughput (S)',
+                'ylabel': 'Activity Factor (Ra)', 'series': series}
+
+    def plot_throughput_vs_activity_factor_replacement(self, l=8, G=0.8):
+        show_figure(self.throughput_vs_activity_factor_replacement_data(l, G))
 
 if __name__ == "__main__":
     # Example Inputs
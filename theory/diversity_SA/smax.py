@@ -0,0 +1,160 @@
+import argparse
+import math
+import os
+from fractions import Fraction
+from functools import lru_cache
+import numpy as np
+
+@lru_cache(maxsize=None)
+def exact_ps_coefficients(l, k):
+    """
+    Compact form of the full (with replacement) P_s formula:
+        P_s(G) = sum_{i=1}^{min(k, l)} w_i * exp(-a_i * G),  a_i = l * (1 - (1 - i / l)^k),
+        w_i = (-1)^(i + 1) * E[C(S, i)],
+    where S is the number of distinct channels among the user's k copies and exp(-a_i G) is the
+    probability that i given channels are free of other users. E[C(S, i)] = C(l, i) * P(i given
+    channels are all picked) is evaluated exactly in integers, so the coefficients stay exact for
+    large l, where the signed-binomial sum over all l terms cancels. Returns (w, a) as tuples of
+    Fractions.
+    """
+    w = []
+    a = []
+    for i in range(1, min(k, l) + 1):
+        hits = sum((-1) ** r * math.comb(i, r) * (l - r) ** k for r in range(i + 1))  # l^k * P(i channels all picked)
+        w.append((-1) ** (i + 1) * Fraction(math.comb(l, i) * hits, l ** k))
+        a.append(Fraction(l ** k - (l - i) ** k, l ** (k - 1)))
+    return tuple(w), tuple(a)
+
+@lru_cache(maxsize=None)
+def ps_coefficients(l, k):
+    """exact_ps_coefficients(l, k) rounded once to float arrays (w, a)."""
+    w, a = exact_ps_coefficients(l, k)
+    return np.array([float(x) for x in w]), np.array([float(x) for x in a])
+
+def coefficient_matrix(pairs):
+    """Zero-padded coefficients of several (l, k) pairs, shape (len(pairs), max k)."""
+    width = max(min(k, l) for l, k in pairs)
+    W = np.zeros((len(pairs), width))
+    A = np.zeros((len(pairs), width))
+    for row, (l, k) in enumerate(pairs):
+        w, a = ps_coefficients(l, k)
+        W[row, :len(w)] = w
+        A[row, :len(a)] = a
+    return W, A
+
+def evaluate(W, A, G, derivatives=0):
+    """P_s and optionally its first/second derivatives in G, one value per row of W/A."""
+    E = W * np.exp(-A * G[:, None])
+    Ps = E.sum(axis=1)
+    if derivatives == 0:
+        return Ps
+    dPs = -(E * A).sum(axis=1)
+    if derivatives == 1:
+        return Ps, dPs
+    return Ps, dPs, (E * A ** 2).sum(axis=1)
+
+def newton_bracketed(f, lo, hi, tol=1e-12, max_iter=200):
+    """
+    Vectorized safeguarded Newton for f(G) = 0 with f(lo) > 0 > f(hi): f returns (value, derivative),
+    steps leaving the bracket fall back to bisection.
+    """
+    G = (lo + hi) / 2
+    for _ in range(max_iter):
+        value, slope = f(G)
+        lo = np.where(value > 0, G, lo)
+        hi = np.where(value > 0, hi, G)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = G - value / slope
+        G_new = np.where(np.isfinite(step) & (step > lo) & (step < hi), step, (lo + hi) / 2)
+        if np.all(np.abs(G_new - G) <= tol * np.maximum(1, G)):
+            return G_new
+        G = G_new
+    return G
+
+def upper_bracket(f, size):
+    """Smallest power of two G with f(G) < 0, per row."""
+    hi = np.ones(size)
+    positive = f(hi) >= 0
+    while positive.any():
+        hi[positive] *= 2
+        positive = f(hi) >= 0
+    return hi
+
+def solve_Smax(pairs):
+    """
+    Throughput-maximizing load G* and S_max = G* P_s(G*) for each (l, k): Newton on
+    S'(G) = P_s + G P_s' = 0, bracketed between 0 (where S' = 1) and the first G where S' < 0.
+    """
+    W, A = coefficient_matrix(pairs)
+
+    def dS(G):
+        Ps, dPs, d2Ps = evaluate(W, A, G, 2)
+        return Ps + G * dPs, 2 * dPs + G * d2Ps
+
+    hi = upper_bracket(lambda G: dS(G)[0], len(pairs))
+    G_star = newton_bracketed(dS, np.zeros(len(pairs)), hi)
+    return G_star, G_star * evaluate(W, A, G_star)
+
+def solve_G_for_beta(pairs, beta, n=1):
+    """
+    Largest load G with beta = (1 - P_s)^n at most the target, for each (l, k). P_s decreases in G,
+    so this is the root of P_s(G) = 1 - beta^(1/n). Returns (G, S = G P_s(G)).
+    """
+    W, A = coefficient_matrix(pairs)
+    target = 1 - np.broadcast_to(np.asarray(beta, dtype=float), (len(pairs),)) ** (1 / n)
+
+    def f(G):
+        Ps, dPs = evaluate(W, A, G, 1)
+        return Ps - target, dPs
+
+    hi = upper_bracket(lambda G: f(G)[0], len(pairs))
+    G = newton_bracketed(f, np.zeros(len(pairs)), hi)
+    return G, G * evaluate(W, A, G)
+
+class SmaxTable:
+    """
+    Precomputed G* and S_max for l = 1..l_max and k = 1..k_max, indexed [l - 1, k - 1].
+    Build once with SmaxTable.build(), save() it to an .npz file and load() it for instant lookups.
+    """
+    def __init__(self, G_star, S_max):
+        self.G_star = G_star
+        self.S_max = S_max
+
+    @classmethod
+    def build(cls, l_max=1024, k_max=16):
+        pairs = [(l, k) for l in range(1, l_max + 1) for k in range(1, k_max + 1)]
+        G_star, S_max = solve_Smax(pairs)
+        return cls(G_star.reshape(l_max, k_max), S_max.reshape(l_max, k_max))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as table:
+            return cls(table['G_star'], table['S_max'])
+
+    def save(self, path):
+        np.savez(path, G_star=self.G_star, S_max=self.S_max)
+
+    def lookup(self, l, k):
+        """(G*, S_max) for scalar or array l and k (broadcast)."""
+        l = np.asarray(l) - 1
+        k = np.asarray(k) - 1
+        return self.G_star[l, k], self.S_max[l, k]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute the S_max / optimal load table for diversity ALOHA.')
+    parser.add_argument('--l-max', type=int, default=1024)
+    parser.add_argument('--k-max', type=int, default=16)
+    parser.add_argument('--out', default='smax_table.npz')
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        table = SmaxTable.load(args.out)
+    else:
+        table = SmaxTable.build(args.l_max, args.k_max)
+        table.save(args.out)
+
+    for l in (8, 16, 64, min(1024, table.G_star.shape[0])):
+        for k in (1, 2, 4):
+            if k <= table.G_star.shape[1]:
+                G_star, S_max = table.lookup(l, k)
+                print(f"l={l:5d} k={k:2d}  G*={G_star:.6f}  S_max={S_max:.6f}")
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from plotting import show_figure
+from theory.analytic import delay_comparison
+from theory.FDMA.generalized_fdma import Generalized_FDMA
+from theory.TDMA.generalized_tdma import Generalized_TDMA
+
+
+def design_grid(M_max=1000, points=1000):
+    '''
+    Design grid of the comparison: every number of servers M in 1..M_max and `points`
+    utilizations P in (0, 1).
+    '''
+    M_values = np.arange(1, M_max + 1)
+    P_values = np.linspace(0, 1, points + 2)[1:-1]
+    return M_values, P_values
+
+
+def comparison(L=1, M_max=1000, points=1000):
+    '''
+    Generalized TDMA and FDMA delays side by side on the M x P design grid:
+    (M_values, P_values, {'tdma', 'fdma', 'ratio'}).
+    '''
+    M_values, P_values = design_grid(M_max, points)
+    return M_values, P_values, delay_comparison(Generalized_TDMA(), Generalized_FDMA(), M_values, P_values, L)
+
+
+def tdma_vs_fdma_data(L=1, M_max=1000, points=1000):
+    '''
+    Figure spec of the delay ratio TDMA / FDMA over the design grid (below 1: TDMA is faster).
+    '''
+    M_values, P_values, delays = comparison(L, M_max, points)
+    return {'title': f'Generalized TDMA / FDMA Expected Delay (L={L})', 'xlabel': 'Utilization P',
+            'ylabel': 'Number of servers M', 'yscale': 'log',
+            'series': [{'x': P_values, 'y': M_values, 'z': delays['ratio'], 'label': 'Delay ratio TDMA / FDMA'}]}
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    M_values, P_values, delays = comparison(L=1, points=1000)
+    elapsed = time.perf_counter() - start
+    print(f"Grid {len(M_values)} x {len(P_values)} in {elapsed * 1000:.1f} ms")
+    print(f"TDMA faster than FDMA at {np.mean(delays['ratio'] < 1):.1%} of the design points")
+    show_figure(tdma_vs_fdma_data(L=1))